@@ -4,6 +4,7 @@
 ### ---------------------------------------------
 ### Day 1: The Tyranny of the Rocket Equation
 ### =============================================
+import numpy as np
 
 # [ Input parsing functions ]
 # ---------------------------
@@ -45,6 +46,38 @@ def compute_total_fuel(mass):
     if f <= 0:
         return 0
     return f + compute_total_fuel(f)
+
+def compute_fuel_batch(masses):
+    '''Computes the required fuel for a batch of modules at once.
+    
+    :param masses: The masses of the modules to compute the fuel consumption
+        for.
+    :type masses: np.array(int)
+    :return: Required amounts of fuel.
+    :rtype: np.array(int)
+    '''
+    return np.asarray(masses, dtype=np.int64) // 3 - 2
+
+def compute_total_fuel_batch(masses):
+    '''Computes the total required fuel for a batch of modules at once: rather
+    than recursing for each module, the fuel computation is applied to the
+    whole array of masses repeatedly (clamping negative amounts to zero) until
+    all the added amounts of fuel are zero. Since the fuel is roughly divided
+    by 3 at each step, this only takes a few vectorized iterations.
+    
+    :param masses: The masses of the modules to compute the fuel consumption
+        for.
+    :type masses: np.array(int)
+    :return: Required amounts of fuel.
+    :rtype: np.array(int)
+    '''
+    fuel = np.asarray(masses, dtype=np.int64)
+    total = np.zeros_like(fuel)
+    while True:
+        fuel = np.maximum(fuel // 3 - 2, 0)
+        if not fuel.any():
+            return total
+        total += fuel
     
 # [ Base tests ]
 # --------------
@@ -60,6 +93,12 @@ def make_tests():
     assert compute_total_fuel(14) == 2
     assert compute_total_fuel(1969) == 966
     assert compute_total_fuel(100756) == 50346
+    ### Batch versions
+    masses = [ 12, 14, 1969, 100756, 1, 0 ]
+    assert compute_fuel_batch(masses).tolist() == \
+        [ compute_fuel(m) for m in masses ]
+    assert compute_total_fuel_batch(masses).tolist() == \
+        [ compute_total_fuel(m) for m in masses ]
 
 if __name__ == '__main__':
     # check function results on example cases
@@ -67,12 +106,12 @@ if __name__ == '__main__':
     
     # get input data
     data_path = '../data/day1.txt'
-    inputs = parse_input(open(data_path, 'r').read())
+    inputs = np.array(parse_input(open(data_path, 'r').read()), dtype=np.int64)
     
     ### PART I
-    solution = sum([ compute_fuel(i) for i in inputs ])
+    solution = int(compute_fuel_batch(inputs).sum())
     print('PART I: solution = {}'.format(solution))
     
     ### PART II
-    solution = sum([ compute_total_fuel(i) for i in inputs ])
+    solution = int(compute_total_fuel_batch(inputs).sum())
     print('PART II: solution = {}'.format(solution))
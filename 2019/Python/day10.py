@@ -4,11 +4,20 @@
 ### ---------------------------------------------
 ### Day 10: Monitoring Station
 ### =============================================
-from math import atan2, sqrt, radians, pi
+from collections import deque
+from itertools import islice
+from math import atan2, radians, pi
+
+import numpy as np
 
 class Map(object):
     
-    '''Util class to represent the map of a field of asteroids.'''
+    '''Util class to represent the map of a field of asteroids.
+    
+    Lines of sight are represented by integer direction vectors reduced by
+    their GCD: two asteroids are in the same line of sight from a reference
+    asteroid if and only if they have the same reduced direction (this is
+    exact, contrary to a comparison of floating-point angles).'''
     
     def __init__(self, data):
         '''initialization function for a new Map.
@@ -24,45 +33,66 @@ class Map(object):
         :param data: Data to create the map.
         :type data: str
         '''
-        self.asteroids = {}
+        self.asteroids = []
         for y, line in enumerate(data.split('\n')):
             for x, char in enumerate(line):
                 if char == '#':
-                    self.asteroids[(x,y)] = set()
+                    self.asteroids.append((x,y))
+        self.xs = np.array([ x for x, _ in self.asteroids ], dtype=np.int64)
+        self.ys = np.array([ y for _, y in self.asteroids ], dtype=np.int64)
                     
-    def compute_asteroid_sights(self, store_coords=False):
-        '''Computes all the other asteroids each asteroid in the map can "see".
-        If the coordinates are not stored, then the function will overlap
-        asteroids in the same line of sight (same angle); else, each asteroid
-        will be stored with its angle, its distance to the reference asteroid
-        and its position.
+    def compute_visible_counts(self, block_size=256):
+        '''Computes the number of other asteroids each asteroid in the map can
+        "see". The pairwise deltas are computed in blocks of reference
+        asteroids (to bound the memory usage) and reduced by their GCD; then,
+        the number of unique reduced directions in each row is the number of
+        visible asteroids.
+        
+        :param block_size: Number of reference asteroids per block.
+        :type block_size: int
+        :return: Number of visible asteroids for each asteroid on the map (in
+            the same order as the asteroids list).
+        :rtype: np.array(int)
+        '''
+        n = len(self.asteroids)
+        counts = np.zeros(n, dtype=np.int64)
+        if n == 0:
+            return counts
+        # (direction keys are positive integers: shift the deltas)
+        span_x = int(self.xs.max() - self.xs.min()) + 1
+        span_y = int(self.ys.max() - self.ys.min()) + 1
+        for start in range(0, n, block_size):
+            end = min(start + block_size, n)
+            dx = self.xs[None, :] - self.xs[start:end, None]
+            dy = self.ys[None, :] - self.ys[start:end, None]
+            g = np.gcd(dx, dy)
+            g[g == 0] = 1 # (reference asteroid itself)
+            keys = (dx // g + span_x) * (2 * span_y + 1) + (dy // g + span_y)
+            keys.sort(axis=1)
+            # count unique directions per row (ignoring the null direction of
+            # the reference asteroid itself)
+            counts[start:end] = (keys[:, 1:] != keys[:, :-1]).sum(axis=1)
+        return counts
+    
+    def compute_station_sights(self, station):
+        '''Computes the lines of sight from a given station: each other
+        asteroid is grouped by its reduced direction from the station, along
+        with its distance in number of steps along this direction.
         
-        :param store_coords: Whether or not to store the coordinates of the
-            other asteroids.
-        :type store_coords: bool
-        :return: Sights of each asteroid on the map.
-        :rtype: dict(tuple, float) or dict(tuple, tuple(float, float, tuple))
+        :param station: Coordinates of the monitoring station.
+        :type station: tuple(int, int)
+        :return: Asteroids per reduced direction, as a (steps, position) list.
+        :rtype: dict(tuple(int, int), list(tuple(int, tuple(int, int))))
         '''
+        sx, sy = station
+        dx = self.xs - sx
+        dy = self.ys - sy
+        g = np.gcd(dx, dy)
         sights = {}
-        for ast1 in self.asteroids:
-            if store_coords:
-                sights[ast1] = []
-                for ast2 in self.asteroids:
-                    # ignore same location
-                    if ast1 == ast2:
-                        continue
-                    # else compute angle and distance, and add asteroid
-                    a = angle(ast1, ast2)
-                    d = dist(ast1, ast2)
-                    sights[ast1].append((a, d, ast2))
-            else:
-                sights[ast1] = set()
-                for ast2 in self.asteroids:
-                    # ignore same location
-                    if ast1 == ast2:
-                        continue
-                    # else compute angle and add asteroid to list
-                    sights[ast1].add(angle(ast1, ast2))
+        for i in np.flatnonzero(g):
+            k = int(g[i])
+            direction = (int(dx[i]) // k, int(dy[i]) // k)
+            sights.setdefault(direction, []).append((k, self.asteroids[i]))
         return sights
                     
 # [ Input parsing functions ]
@@ -79,34 +109,18 @@ def parse_input(data):
 
 # [ Computation functions ]
 # -------------------------
-def dist(ast1, ast2):
-    '''Computes the Euclidean distance between two 2D points.
+def angle(direction):
+    '''Computes the angle of a direction using the atan2 and rotates the
+    result by 90° counterclockwise (so that "up" is 0 and the angle increases
+    clockwise).
     
-    :param ast1: Coordinates of the first point.
-    :type ast1: tuple(int, int)
-    :param ast2: Coordinates of the second point.
-    :type ast2: tuple(int, int)
-    :return: Euclidean distance between the two 2D points.
+    :param direction: Direction (dx, dy) to get the angle of.
+    :type direction: tuple(int, int)
+    :return: Modified angle of the direction.
     :rtype: float
     '''
-    x1, y1 = ast1
-    x2, y2 = ast2
-    return sqrt((x2-x1)*(x2-x1) + (y2-y1)*(y2-y1))
-                    
-def angle(ast1, ast2):
-    '''Computes the angle between two 2D points using the atan2 and rotates the
-    result by 90° counterclockwise.
-    
-    :param ast1: Coordinates of the first point.
-    :type ast1: tuple(int, int)
-    :param ast2: Coordinates of the second point.
-    :type ast2: tuple(int, int)
-    :return: Modified angle between the two 2D points.
-    :rtype: float
-    '''
-    x1, y1 = ast1
-    x2, y2 = ast2
-    return (atan2(y1 - y2, x1 - x2) - radians(90)) % (pi*2.0)
+    dx, dy = direction
+    return (atan2(-dy, -dx) - radians(90)) % (pi*2.0)
 
 ### Part I
 def find_best_asteroid(map):
@@ -119,16 +133,54 @@ def find_best_asteroid(map):
         asteroid.
     :rtype: tuple(tuple(int, int), int)
     '''
-    # compute each asteroid sight (and overwrite the ones that are in the same
-    # angle)
-    sights = map.compute_asteroid_sights()
-    # associate the number of visible asteroids to the asteroid position
-    n_visible = [ (k, len(v)) for k, v in sights.items() ]
+    # compute the number of visible asteroids for each asteroid
+    counts = map.compute_visible_counts()
     # return the best one, i.e. the position that "sees" the most asteroids
-    return sorted(n_visible, key=lambda x: x[1], reverse=True)[0]
+    best = int(np.argmax(counts))
+    return map.asteroids[best], int(counts[best])
 
 ### Part II
-def process_laser_vaporization(map, station):
+def iter_vaporization(map, station):
+    '''Generator that yields the asteroids in the order they are vaporized by
+    the laser of the station. The targets are grouped by reduced direction in
+    per-angle queues sorted by distance, then the laser rotates through the
+    queues: each turn pops the closest asteroid of a queue and puts the queue
+    back at the end of the rotation if it still has asteroids.
+    
+    :param map: Map of the asteroids in the neighborhood.
+    :type map: Map
+    :param station: Coordinates of the monitoring station.
+    :type station: tuple(int, int)
+    :return: Generator of the positions of vaporized asteroids.
+    :rtype: generator(tuple(int, int))
+    '''
+    sights = map.compute_station_sights(station)
+    # sort the queues per angle, and each queue per distance
+    rotation = deque([ deque([ p for _, p in sorted(sights[d]) ]) \
+        for d in sorted(sights, key=angle) ])
+    # roll the laser until all asteroids have been destroyed
+    while rotation:
+        targets = rotation.popleft()
+        yield targets.popleft()
+        if targets:
+            rotation.append(targets)
+
+def get_vaporized_asteroid(map, station, k):
+    '''Gets the k-th asteroid vaporized by the laser of the station.
+    
+    :param map: Map of the asteroids in the neighborhood.
+    :type map: Map
+    :param station: Coordinates of the monitoring station.
+    :type station: tuple(int, int)
+    :param k: Rank of the asteroid to get (starting from 1).
+    :type k: int
+    :return: Position of the k-th vaporized asteroid, or None if there are less
+        than k asteroids to vaporize.
+    :rtype: tuple(int, int)
+    '''
+    return next(islice(iter_vaporization(map, station), k - 1, None), None)
+
+def process_laser_vaporization(map, station, n_vaporized=200):
     '''Computes the whole laser vaporization process given some coordinates have
     been picked for the monitoring station.
     
@@ -136,27 +188,18 @@ def process_laser_vaporization(map, station):
     :type map: Map
     :param station: Coordinates of the monitoring station.
     :type station: tuple(int, int)
-    :return: Checksum of the laser vaporization process.
+    :param n_vaporized: Rank of the vaporized asteroid to compute the checksum
+        of.
+    :type n_vaporized: int
+    :return: Checksum of the laser vaporization process, or None if there are
+        less than n_vaporized asteroids to vaporize.
     :rtype: int
     '''
-    # compute each asteroid sight (keep track of asteroids angle, distance and
-    # position)
-    sights = map.compute_asteroid_sights(store_coords=True)[station]
-    # sort the sights per angle, then per distance
-    sorted_sights = sorted(sorted(sights, key=lambda x: x[1]), key=lambda x: x[0])
-    # roll the laser until 200 asteroids have been destroyed
-    last_angle = -1.0
-    for i in range(200):
-        idx = 0
-        a = sorted_sights[idx][0]
-        while a <= last_angle and idx < len(sorted_sights):
-            a = sorted_sights[idx][0]
-            if a <= last_angle:
-                idx += 1
-        a, d, p = sorted_sights.pop(idx)
-        last_angle = a % (2.0*pi)
-    # compute the checksum for the position of the 200th destroyed asteroid
-    target_x, target_y = p
+    # compute the checksum for the position of the n-th destroyed asteroid
+    target = get_vaporized_asteroid(map, station, n_vaporized)
+    if target is None:
+        return None
+    target_x, target_y = target
     return target_x * 100 + target_y
 
 # [ Base tests ]
@@ -254,6 +297,21 @@ def make_tests():
 ###.##.####.##.#..##''')
     coords, _ = find_best_asteroid(map)
     assert process_laser_vaporization(map, coords) == 802
+    order = list(iter_vaporization(map, coords))
+    assert len(order) == len(map.asteroids) - 1
+    assert order[0] == (11, 12)
+    assert order[1] == (12, 1)
+    assert order[49] == (16, 9)
+    assert order[200] == (10, 9)
+    assert order[-1] == (11, 1)
+    assert get_vaporized_asteroid(map, coords, 100) == (10, 16)
+    map = parse_input('''.#..#
+.....
+#####
+....#
+...##''')
+    coords, _ = find_best_asteroid(map)
+    assert process_laser_vaporization(map, coords) is None
 
 if __name__ == '__main__':
     # check function results on example cases
@@ -4,7 +4,10 @@
 ### ---------------------------------------------
 ### Day 11: Space Police
 ### =============================================
-from intcode import IntcodeProgram
+import numpy as np
+
+from intcode import IntcodeCore, STEP_HALT, STEP_ERROR
+from grid import Grid, NEIGHBOR_OFFSETS, render_chars
 
 # [ Input parsing functions ]
 # ---------------------------
@@ -20,8 +23,41 @@ def parse_input(data):
 
 # [ Computation functions ]
 # -------------------------
+# direction vectors (up, right, down, left), indexed by the robot's direction
+DIRECTIONS = NEIGHBOR_OFFSETS
+
+# flags stored for each panel of the board
+WHITE = 1
+PAINTED = 2
+
+def get_white_panels(board):
+    '''Gets the panels that are currently white, cropped to their bounding
+    box (panels that were repainted black can extend the board bounds).
+    
+    :param board: Board of the panels.
+    :type board: Grid
+    :return: White panels (of shape (height, width)).
+    :rtype: np.array(bool)
+    '''
+    white = (board.to_array() & WHITE) > 0
+    rows = np.flatnonzero(white.any(axis=1))
+    cols = np.flatnonzero(white.any(axis=0))
+    if len(rows) == 0:
+        return np.zeros((0, 0), dtype=bool)
+    return white[rows[0]:rows[-1]+1, cols[0]:cols[-1]+1]
+
+def render(cells):
+    '''Gets the string representation of a boolean array.
+    
+    :param cells: Cells to render (of shape (height, width)).
+    :type cells: np.array(bool)
+    :return: Rendered cells.
+    :rtype: str
+    '''
+    return render_chars(np.where(cells, '█', ' '))
+
 ### Part I + II
-def process_inputs(inputs, start_white=False, display=False, debug=False):
+def process_inputs(inputs, start_white=False, display=False):
     '''Executes the Intcode program on the provided inputs and finds out the
     number of panels that have been painted at least once. It can also display
     the message that has been painted if necessary.
@@ -34,98 +70,77 @@ def process_inputs(inputs, start_white=False, display=False, debug=False):
     :param display: If true, then the final state of the board is displayed in
         the shell.
     :type display: bool
-    :param debug: Whether or not the IntcodeProgram should debug its
-        execution at each instruction processing.
-    :type debug: bool
-    :return: Number of panels painted at least once.
-    :rtype: int
+    :return: Number of panels painted at least once, and final board.
+    :rtype: int, Grid
     '''
-    # prepare the board and the set of painted panels:
-    # - the board only remembers the panels painted white
-    # - the painted set remembers all the panels that have been painted at least
-    # once
-    board = set()
-    painted = set()
+    # prepare the board: each panel stores whether it is currently white and
+    # whether it has been painted at least once
+    board = Grid(fill=0, dtype=np.uint8)
     # initialize the painting robot: facing up, at the origin coordinates
     dir = 0
     x, y = 0, 0
     # (if starting white: mark the current panel as already painted white)
     if start_white:
-        board.add((x, y))
+        board[x, y] = WHITE
 
-    # prepare the program instance to read the given inputs as an Intcode
-    # program
-    program = IntcodeProgram(inputs, debug=debug)
-    running = True
-    # execute the program until it halts (but pause every 2 outputs)
-    while running:
-        # get the input depending on the state of the panel: if painted white
-        # (i.e. visible in the board), the input is 1; else it is 0
-        input = 1 if (x, y) in board else 0
-        # insert the input in the program's memory
-        program.push_memory(input)
-        # execute until 2 digits have been outputted
-        state = program.run(pause_every=2)
-        # check for state:
-        # . if paused: parse outputs and apply the actions
-        if state == 'pause':
-            color, rotation = program.output
-            program.reset_output()
-            if color == 1:
-                board.add((x, y))
-            else:
-                board.discard((x, y))
-            painted.add((x, y))
-            m = -1 if rotation == 0 else 1
-            dir = (dir + m) % 4
-            if dir == 0: # up
-                y -= 1
-            elif dir == 1: # right
-                x += 1
-            elif dir == 2: # down
-                y += 1
-            elif dir == 3: # left
-                x -= 1
-        # . else: stop the program
-        elif state is None:
-            running = False
+    # prepare the program core to read the given inputs as an Intcode program
+    core = IntcodeCore(inputs)
+    status = None
+    # execute the program until it halts (it stops each time it needs the
+    # color of the current panel)
+    while status != STEP_HALT and status != STEP_ERROR:
+        # get the input depending on the state of the panel
+        panel = board[x, y]
+        core.inputs.append(panel & WHITE)
+        status = core.run()
+        # parse outputs and apply the actions
+        if len(core.outputs) < 2:
             break
+        color, rotation = core.outputs[:2]
+        del core.outputs[:]
+        board[x, y] = (WHITE if color == 1 else 0) | PAINTED
+        dir = (dir + (1 if rotation == 1 else -1)) % 4
+        dx, dy = DIRECTIONS[dir]
+        x += dx
+        y += dy
             
     # if necessary, display the final message, i.e. the board that
-    # has been printed (and only contains the painted panels)
+    # has been printed (and only contains the panels painted white)
     if display:
-        # . separate horizontal from vertical coordinates
-        x, y = zip(*board)
-        # . find board boundaries
-        min_x, max_x = min(x), max(x)
-        min_y, max_y = min(y), max(y)
-        # . iterate through the board to print out the message
         print('')
-        for y in range(min_y, max_y + 1):
-            row = ''
-            for x in range(min_x, max_x + 1):
-                if (x, y) in board:
-                    row += '█'
-                else:
-                    row += ' '
-            print(row)
+        print(render(get_white_panels(board)))
         print('')
         
     # get the number of panels that have been painted at least once
     # (counts each panel once, and counts the panels even if they have been
     # repainted black)
-    return len(painted)
+    return int(np.count_nonzero(board.to_array() & PAINTED)), board
+
+# [ Base tests ]
+# --------------
+def make_tests():
+    '''Performs tests on the provided examples to check the result of the
+    computation functions is ok.'''
+    # (program that reads a color and outputs the example instructions)
+    program = []
+    for color, rotation in [ (1,0), (0,0), (1,0), (1,0), (0,1), (1,0), (1,0) ]:
+        program += [ 3,100,104,color,104,rotation ]
+    n_painted, board = process_inputs(program + [ 99 ])
+    assert n_painted == 6
+    assert render(get_white_panels(board)) == '  █\n  █\n██ '
 
 if __name__ == '__main__':
+    # check function results on example cases
+    make_tests()
+    
     # get input data
     data_path = '../data/day11.txt'
     inputs = parse_input(open(data_path, 'r').read())
     
     ### PART I
-    solution = process_inputs(inputs)
+    solution, _ = process_inputs(inputs)
     print('PART I: solution = {}'.format(solution))
     
     ### PART II
-    solution = process_inputs(inputs, start_white=True, display=True)
+    process_inputs(inputs, start_white=True, display=True)
     print('PART II: solution (see above in the shell)')
-    
@@ -5,7 +5,9 @@
 ### Day 12: The N-Body Problem
 ### =============================================
 import re
-from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
                     
 # [ Input parsing functions ]
 # ---------------------------
@@ -43,6 +45,50 @@ def compute_total_energy(moon):
     kinetic_energy = abs(vx) + abs(vy) + abs(vz)
     return potential_energy * kinetic_energy
 
+def prepare_state(moons):
+    '''Prepares the state of the system as NumPy arrays: the positions and the
+    velocities of the moons, with one row per moon and one column per axis.
+    
+    :param moons: Initial positions of the moons to process.
+    :type moons: list(tuple(int, int, int))
+    :return: Positions and velocities of the moons.
+    :rtype: np.array(int), np.array(int)
+    '''
+    positions = np.array(moons, dtype=np.int64)
+    velocities = np.zeros_like(positions)
+    return positions, velocities
+
+def simulate_step(positions, velocities):
+    '''Simulates one time step of the moons' movement (in-place). The gravity
+    applied to each moon is the sum of the signs of its position differences
+    with all the other moons. The arrays can contain all axis or only one (the
+    first dimension is always the moon).
+    
+    :param positions: Current positions of the moons.
+    :type positions: np.array(int)
+    :param velocities: Current velocities of the moons.
+    :type velocities: np.array(int)
+    '''
+    # apply gravity
+    velocities += np.sign(positions[None, :] - positions[:, None]).sum(axis=1)
+    # apply velocity
+    positions += velocities
+
+def compute_system_energy(positions, velocities):
+    '''Computes the total energy of the entire system (i.e. the sum of the
+    total energies of each moon).
+    
+    :param positions: Current positions of the moons.
+    :type positions: np.array(int)
+    :param velocities: Current velocities of the moons.
+    :type velocities: np.array(int)
+    :return: Total energy of the entire system.
+    :rtype: int
+    '''
+    potential_energy = np.abs(positions).sum(axis=1)
+    kinetic_energy = np.abs(velocities).sum(axis=1)
+    return int((potential_energy * kinetic_energy).sum())
+
 def simulate_moons(moons, timesteps):
     '''Simulates the moons' movement over a given number of time steps and
     computes the final total energy of the entire system (i.e. the sum of the
@@ -55,35 +101,10 @@ def simulate_moons(moons, timesteps):
     :return: Total energy of the entire system at the end of the simulation.
     :rtype: int
     '''
-    # prepare moons with their velocities
-    moons = [ [ x, y, z, 0., 0., 0. ] for x, y, z in moons ]
-    # prepare all the unique moon pairs
-    moon_pairs = list(combinations(range(len(moons)), 2))
-
-    for time in range(timesteps):
-        # apply gravity
-        for i1, i2 in moon_pairs:
-            x1, y1, z1, vx1, vy1, vz1 = moons[i1]
-            x2, y2, z2, vx2, vy2, vz2 = moons[i2]
-            if x1 > x2:
-                moons[i1][3] -= 1; moons[i2][3] += 1
-            elif x1 < x2:
-                moons[i1][3] += 1; moons[i2][3] -= 1
-            if y1 > y2:
-                moons[i1][4] -= 1; moons[i2][4] += 1
-            elif y1 < y2:
-                moons[i1][4] += 1; moons[i2][4] -= 1
-            if z1 > z2:
-                moons[i1][5] -= 1; moons[i2][5] += 1
-            elif z1 < z2:
-                moons[i1][5] += 1; moons[i2][5] -= 1
-        # apply velocity
-        for moon in moons:
-            moon[0] += moon[3]
-            moon[1] += moon[4]
-            moon[2] += moon[5]
-
-    return int(sum([ compute_total_energy(m) for m in moons ]))
+    positions, velocities = prepare_state(moons)
+    for _ in range(timesteps):
+        simulate_step(positions, velocities)
+    return compute_system_energy(positions, velocities)
 
 ### Part II
 def GCD(x, y):
@@ -112,66 +133,56 @@ def LCM(x, y):
    '''
    return (x * y) // GCD(x, y)
 
-def find_first_repetition(moons):
-    '''Simulates the moons' movement until they repeat a previous state.
+def find_axis_period(positions):
+    '''Simulates the moons' movement on one axis until they come back to their
+    initial state. Because the simulation is reversible, the first state to be
+    repeated is always the initial one: there is no need to store the previous
+    states, we just compare with the initial positions (and null velocities).
     
-    :param moons: Initial positions of the moons to process.
-    :type moons: list(tuple(int, int, int))
-    :return: Number of steps until the first repetition.
+    :param positions: Initial positions of the moons on the axis.
+    :type positions: list(int)
+    :return: Period of the axis.
     :rtype: int
     '''
-    # prepare moons with their velocities
-    moons = [ [ x, y, z, 0., 0., 0. ] for x, y, z in moons ]
-    # prepare all the unique moon pairs
-    moon_pairs = list(combinations(range(len(moons)), 2))
-
-    history_x, history_y, history_z = {}, {}, {}
-    period_x, period_y, period_z = None, None, None
+    initial = np.array(positions, dtype=np.int64)
+    positions = initial.copy()
+    velocities = np.zeros_like(positions)
     time = 0
     while True:
-        # apply gravity
-        for i1, i2 in moon_pairs:
-            x1, y1, z1, vx1, vy1, vz1 = moons[i1]
-            x2, y2, z2, vx2, vy2, vz2 = moons[i2]
-            if x1 > x2:
-                moons[i1][3] -= 1; moons[i2][3] += 1
-            elif x1 < x2:
-                moons[i1][3] += 1; moons[i2][3] -= 1
-            if y1 > y2:
-                moons[i1][4] -= 1; moons[i2][4] += 1
-            elif y1 < y2:
-                moons[i1][4] += 1; moons[i2][4] -= 1
-            if z1 > z2:
-                moons[i1][5] -= 1; moons[i2][5] += 1
-            elif z1 < z2:
-                moons[i1][5] += 1; moons[i2][5] -= 1
-        # apply velocity
-        for moon in moons:
-            moon[0] += moon[3]
-            moon[1] += moon[4]
-            moon[2] += moon[5]
-        # hash state:
-        # . hash each axis
-        state_x = hash(str([ (x, vx) for x, _, _, vx, _, _ in moons ]))
-        state_y = hash(str([ (y, vy) for _, y, _, _, vy, _ in moons ]))
-        state_z = hash(str([ (z, vz) for _, _, z, _, _, vz in moons ]))
-        # . check the matching dict for a repetition
-        if period_x is None and state_x in history_x:
-            period_x = time - history_x[state_x]
-        if period_y is None and state_y in history_y:
-            period_y = time - history_y[state_y]
-        if period_z is None and state_z in history_z:
-            period_z = time - history_z[state_z]
-        if period_x is not None and period_y is not None and period_z is not None:
-            break
-        # . store the hash with the current time for further checks
-        history_x[state_x] = time
-        history_y[state_y] = time
-        history_z[state_z] = time
+        simulate_step(positions, velocities)
         time += 1
+        if not velocities.any() and (positions == initial).all():
+            return time
 
+def find_first_repetition(moons, parallel=False):
+    '''Simulates the moons' movement until they repeat a previous state. The 3
+    axis are independent, so the period of each axis is computed separately
+    (in worker processes, if parallel is enabled) and the total period is their
+    least common multiple.
+    
+    :param moons: Initial positions of the moons to process.
+    :type moons: list(tuple(int, int, int))
+    The periods are computed one after the other by default, on purpose: the
+    scans only take a few seconds, and starting the worker processes costs
+    about as much as it saves (on a single core, the parallel version is even
+    slower). So the concurrent computation is opt-in, and only the tests run
+    it (to check that it gives the same result).
+    
+    :param parallel: Whether or not to compute the periods of the axis
+        concurrently in worker processes (this only pays off with several
+        cores and long periods).
+    :type parallel: bool
+    :return: Number of steps until the first repetition.
+    :rtype: int
+    '''
+    axis = [ [ moon[a] for moon in moons ] for a in range(3) ]
+    if parallel:
+        with ProcessPoolExecutor(max_workers=3) as executor:
+            period_x, period_y, period_z = executor.map(find_axis_period, axis)
+    else:
+        period_x, period_y, period_z = map(find_axis_period, axis)
     # find the total repetition period by getting the LCM of the three subperiods
-    return LCM(LCM(period_x, period_y), LCM(period_y, period_z))
+    return LCM(LCM(period_x, period_y), period_z)
 
 # [ Base tests ]
 # --------------
@@ -192,6 +203,14 @@ def make_tests():
     assert find_first_repetition([
         (-1, 0, 2), (2, -10, -7), (4, -8, 8), (3, 5, -1)
     ]) == 2772
+    assert find_first_repetition([
+        (-1, 0, 2), (2, -10, -7), (4, -8, 8), (3, 5, -1)
+    ], parallel=True) == 2772
+    assert find_first_repetition([
+        (-8, -10, 0), (5, 5, 10), (2, -7, 3), (9, -8, -3)
+    ], parallel=True) == find_first_repetition([
+        (-8, -10, 0), (5, 5, 10), (2, -7, 3), (9, -8, -3)
+    ], parallel=False)
     assert find_first_repetition([
         (-8, -10, 0), (5, 5, 10), (2, -7, 3), (9, -8, -3)
     ]) == 4686774924
@@ -209,6 +228,8 @@ if __name__ == '__main__':
     print('PART I: solution = {}'.format(solution))
     
     ### PART II
+    # (the axis are scanned one after the other: the worker processes are not
+    # worth it for this input)
     solution = find_first_repetition(moons)
     print('PART II: solution = {}'.format(solution))
     
@@ -9,6 +9,7 @@ import numpy as np
 from PIL import Image
 
 from intcode import IntcodeProgram
+from grid import Grid
 
 # [ Input parsing functions ]
 # ---------------------------
@@ -24,31 +25,21 @@ def parse_input(data):
 
 # [ Computation functions ]
 # -------------------------
-DISPLAY_MAP = { None: ' ', 'W': '█', 'B': '□', 'H': '▂', 'O': '●' }
+# tile ids: 0 = empty, 1 = wall, 2 = block, 3 = horizontal paddle, 4 = ball
+EMPTY, WALL, BLOCK, PADDLE, BALL = range(5)
+DISPLAY_MAP = { EMPTY: ' ', WALL: '█', BLOCK: '□', PADDLE: '▂', BALL: '●' }
 def display_board(board):
     '''Displays the board in the shell.
     
     :param board: Board to display.
-    :type board: dict
+    :type board: Grid
     '''
-    # get the board boundaries
-    x, y = zip(*list(board.keys()))
-    min_x, max_x = min(x), max(x)
-    min_y, max_y = min(y), max(y)
-    # print the grid
-    for y in range(min_y, max_y+1):
-        row = ''
-        for x in range(min_x, max_x+1):
-            if (x, y) in board:
-                row += DISPLAY_MAP[board[(x, y)]]
-            else:
-                row += ' '
-        print(row)
+    print(board.render(DISPLAY_MAP))
 
 EXPORT_DIR = os.path.join(os.getcwd(), 'day13')
 EXPORT_MAP = {
-    None: (0, 0, 0), 'W': (255, 255, 255), 'B': (255, 255, 0),
-    'H': (100, 100, 255), 'O': (255, 0, 0)
+    EMPTY: (0, 0, 0), WALL: (255, 255, 255), BLOCK: (255, 255, 0),
+    PADDLE: (100, 100, 255), BALL: (255, 0, 0)
 }
 def export_board(time, board, scale=10):
     '''Saves the board as a .jpg image (the file name is determined by the given
@@ -58,28 +49,15 @@ def export_board(time, board, scale=10):
     :param time: Time step corresponding to the export.
     :type time: int
     :param board: Board to export as an image.
-    :type board: dict
+    :type board: Grid
     :param scale: Export scale to apply to the image.
     :type scale: int
     '''
     # create the export path if necessary
     if not os.path.exists(EXPORT_DIR):
         os.makedirs(EXPORT_DIR)
-    # get the image boundaries (with export scale)
-    x, y = zip(*list(board.keys()))
-    min_x, max_x = min(x), max(x)
-    min_y, max_y = min(y), max(y)
-    w = (max_x - min_x + 1) * scale
-    h = (max_y - min_y + 1) * scale
-    # create the grid as a NumPy array (with export scale)
-    arr = np.zeros((h, w, 3))
-    for (x, y), marker in board.items():
-        mr, mg, mb = EXPORT_MAP[marker]
-        arr[scale*y:scale*(y+1), scale*x:scale*(x+1), 0] = mr
-        arr[scale*y:scale*(y+1), scale*x:scale*(x+1), 1] = mg
-        arr[scale*y:scale*(y+1), scale*x:scale*(x+1), 2] = mb
     # export as a JPG image
-    img = Image.fromarray(arr.astype(np.uint8)).convert('RGB')
+    img = Image.fromarray(board.to_image(EXPORT_MAP, scale=scale)).convert('RGB')
     img.save(os.path.join(EXPORT_DIR, '{}.jpg'.format(time)))
 
 ### Part I
@@ -98,10 +76,10 @@ def count_blocks(inputs, display=False, debug=False):
     :type debug: bool
     :return: Inital board (when no game was played) and number of blocks on the
         screen when the game exits.
-    :rtype: dict, int
+    :rtype: Grid, int
     '''
     # prepare the board
-    board = {}
+    board = Grid()
     # prepare the program instance to read the given inputs as an Intcode
     # program
     program = IntcodeProgram(inputs, debug=debug)
@@ -115,17 +93,7 @@ def count_blocks(inputs, display=False, debug=False):
         if state == 'pause':
             x, y, id = program.output
             program.reset_output()
-            if id == 0:
-                marker = None
-            elif id == 1:
-                marker = 'W'
-            elif id == 2:
-                marker = 'B'
-            elif id == 3:
-                marker = 'H'
-            else:
-                marker = 'O'
-            board[(x, y)] = marker
+            board[(x, y)] = id
         # . else: stop the program
         elif state is None:
             running = False
@@ -134,7 +102,7 @@ def count_blocks(inputs, display=False, debug=False):
     if display:
         display_board(board)
             
-    return board, sum([ 1 if m == 'B' else 0 for m in board.values() ])
+    return board, board.count(BLOCK)
 
 ### Part II
 def compute_score(board, inputs, export=False, debug=False):
@@ -142,7 +110,7 @@ def compute_score(board, inputs, export=False, debug=False):
     score of the player when the last block has been destroyed.
     
     :param board: Initial board.
-    :type board: dict
+    :type board: Grid
     :param inputs: List of integers to execute as an Intcode program.
     :type inputs: list(int)
     :param export: Whether or not to export the board as an image at each game
@@ -155,11 +123,8 @@ def compute_score(board, inputs, export=False, debug=False):
     :rtype: int
     '''
     # get paddle and ball coordinates
-    for (x, y), marker in board.items():
-        if marker == 'H':
-            px = x
-        elif marker == 'O':
-            bx = x
+    px, _ = board.position(np.flatnonzero(board.data == PADDLE)[0])
+    bx, _ = board.position(np.flatnonzero(board.data == BALL)[0])
     init_n_blocks = None
     last_n_blocks = None
     # prepare the program instance to read the given inputs as an Intcode
@@ -200,26 +165,18 @@ def compute_score(board, inputs, export=False, debug=False):
                     print('\n')
                     break
             else:
-                if id == 0:
-                    marker = None
-                elif id == 1:
-                    marker = 'W'
-                elif id == 2:
-                    marker = 'B'
-                elif id == 3:
-                    marker = 'H'
+                if id == PADDLE:
                     px = x
-                else:
-                    marker = 'O'
+                elif id == BALL:
                     bx = x
-                board[(x, y)] = marker
+                board[(x, y)] = id
         # . else: stop the program
         elif state is None:
             running = False
             break
             
         # . check to see if all blocks have disappeared
-        n_blocks = sum([ 1 if m == 'B' else 0 for m in board.values() ])
+        n_blocks = board.count(BLOCK)
         # (initial blocks count and initial export, if need be)
         if init_n_blocks is None:
             init_n_blocks = n_blocks
@@ -4,8 +4,8 @@
 ### ---------------------------------------------
 ### Day 14: Space Stoichiometry
 ### =============================================
-from math import ceil
-from collections import defaultdict
+from collections import deque
+from functools import lru_cache
 
 # [ Input parsing functions ]
 # ---------------------------
@@ -37,29 +37,161 @@ def parse_input(data):
 
 # [ Computation functions ]
 # -------------------------
-### Part I
-def compute_distances(materials, reactions):
-    '''Computes the "distance" of each material to ORE so that we can evaluate
-    in which order they should processed further on.
+class ReactionPlanner(object):
+    
+    '''Util class to compute the amount of ORE required to produce some fuel.
+    The reactions are compiled once into integer arrays (materials are
+    identified by their index) and sorted in topological order, from FUEL to
+    ORE: a material always comes after all the materials that consume it, so
+    that its total required amount is known when it is processed. Each query is
+    then a single linear pass over the reactions.'''
+    
+    def __init__(self, materials, reactions):
+        '''Initialization function for a new ReactionPlanner.
+        
+        :param materials: Set of all materials used in the list of reactions.
+        :type materials: set(str)
+        :param reactions: All possible reactions (keyed by product).
+        :type reactions: dict(int, dict(str, int))
+        '''
+        self.names = sorted(materials)
+        self.index = { name: i for i, name in enumerate(self.names) }
+        self.ore = self.index['ORE']
+        self.fuel = self.index['FUEL']
+        n = len(self.names)
+        # compile the reactions: produced quantity and list of
+        # (reagent index, reagent amount) for each product
+        self.quantities = [ 0 ] * n
+        self.reagents = [ [] for _ in range(n) ]
+        for product, (reagents, qty) in reactions.items():
+            p = self.index[product]
+            self.quantities[p] = qty
+            self.reagents[p] = [ (self.index[r], a) for r, a in reagents.items() ]
+        self.order = self.compute_order()
+    
+    def compute_order(self):
+        '''Computes the topological order of the products (Kahn's algorithm):
+        a product is ready to be processed when all its consumers have been.
+        
+        :return: Indices of the products, from FUEL to the closest ones to ORE
+            (ORE itself is excluded).
+        :rtype: list(int)
+        '''
+        n_consumers = [ 0 ] * len(self.names)
+        for reagents in self.reagents:
+            for r, _ in reagents:
+                n_consumers[r] += 1
+        queue = deque([ i for i, c in enumerate(n_consumers) if c == 0 ])
+        order = []
+        while queue:
+            p = queue.popleft()
+            if p == self.ore:
+                continue
+            order.append(p)
+            for r, _ in self.reagents[p]:
+                n_consumers[r] -= 1
+                if n_consumers[r] == 0:
+                    queue.append(r)
+        return order
+    
+    def produce(self, fuel_amount, inventory=None):
+        '''Gets the amount of raw ORE required to produce the given quantity of
+        fuel, starting from an inventory of leftover materials (from previous
+        productions). Producing fuel in several steps while carrying the
+        leftovers over costs exactly as much ORE as producing it all at once.
+        
+        :param fuel_amount: Amount of fuel to produce.
+        :type fuel_amount: int
+        :param inventory: If not None, leftover amount of each material before
+            the production (it is not modified).
+        :type inventory: list(int)
+        :return: Required amount of ORE and leftover amount of each material
+            after the production.
+        :rtype: int, list(int)
+        '''
+        n = len(self.names)
+        inventory = [ 0 ] * n if inventory is None else list(inventory)
+        required = [ 0 ] * n
+        required[self.fuel] = fuel_amount
+        for p in self.order:
+            required_qty = required[p] - inventory[p]
+            if required_qty <= 0:
+                inventory[p] = -required_qty
+                continue
+            ratio = -(-required_qty // self.quantities[p]) # (ceil division)
+            inventory[p] = ratio * self.quantities[p] - required_qty
+            for r, a in self.reagents[p]:
+                required[r] += ratio * a
+        return required[self.ore], inventory
+    
+    def required_ore(self, fuel_amount=1):
+        '''Gets the required amount of raw ORE to produce the given quantity of
+        fuel.
+        
+        :param fuel_amount: Amount of fuel to produce.
+        :type fuel_amount: int
+        :return: Required amount of ORE.
+        :rtype: int
+        '''
+        return self.produce(fuel_amount)[0]
+    
+    def max_fuel(self, ore_amount):
+        '''Computes the maximum amount of fuel that can be produced with the
+        given amount of ore. Since the ORE cost is monotone in the amount of
+        fuel, the answer is first bracketed by doubling the amount of fuel to
+        add, then refined by halving it (i.e. a binary search on the bits of the
+        answer). Each successful probe is committed: its leftovers are carried
+        over so that the next probe only computes the additional production.
+        
+        :param ore_amount: Available amount of ore.
+        :type ore_amount: int
+        :return: Amount of fuel that can be produced and number of probes (ORE
+            cost computations) that were required.
+        :rtype: int, int
+        '''
+        fuel, ore_used, inventory = 0, 0, None
+        n_probes = 0
+        step = 1
+        growing = True
+        while step > 0:
+            n_probes += 1
+            ore, new_inventory = self.produce(step, inventory)
+            if ore_used + ore <= ore_amount:
+                fuel += step
+                ore_used += ore
+                inventory = new_inventory
+                if growing:
+                    step *= 2
+                    continue
+            growing = False
+            step //= 2
+        return fuel, n_probes
+
+@lru_cache(maxsize=16)
+def _build_planner(materials, reactions):
+    # (the arguments are the frozen contents of the materials and reactions)
+    return ReactionPlanner(set(materials),
+        { p: (dict(reagents), qty) for p, reagents, qty in reactions })
+
+def get_planner(materials, reactions):
+    '''Gets the planner of a list of reactions: it is only built on the first
+    call with these reactions, then reused. The cache is keyed by the contents
+    of the materials and reactions (frozen into hashable sets), so a list of
+    reactions that is modified in-between gets a new planner.
     
     :param materials: Set of all materials used in the list of reactions.
     :type materials: set(str)
     :param reactions: All possible reactions (keyed by product).
     :type reactions: dict(int, dict(str, int))
-    :return: Distances of all materials to ORE.
-    :rtype: dict(str, int)
+    :return: Reaction planner.
+    :rtype: ReactionPlanner
     '''
-    distances = { 'ORE': 0 }
-    while len(distances) < len(materials):
-        for material in materials:
-            if material in distances:
-                continue
-            reagents = reactions[material][0].keys()
-            if not all([ i in distances for i in reagents ]):
-                continue
-            distances[material] = max([ distances[i] for i in reagents ]) + 1
-    return distances
+    return _build_planner(frozenset(materials), frozenset([
+        (product, frozenset(reagents.items()), qty)
+        for product, (reagents, qty) in reactions.items()
+    ]))
 
+### Part I
 def required_ore(materials, reactions, fuel_amount=1):
     '''Gets the required amount of raw ORE to produce the given quantity of
     fuel, depending on the materials and reactions used.
@@ -73,21 +205,7 @@ def required_ore(materials, reactions, fuel_amount=1):
     :return: Required amount of ORE.
     :rtype: int
     '''
-    distances = compute_distances(materials, reactions)
-    required_products = defaultdict(int)
-    required_products['FUEL'] = fuel_amount
-    while len(required_products) > 1 or 'ORE' not in required_products:
-        product = max(required_products, key=lambda x: distances[x])
-        required_qty = required_products[product]
-        del required_products[product]
-        if product == 'ORE':
-            required_products[product] = required_qty
-            continue
-        reagents, qty = reactions[product]
-        for reagent_name, reagent_amount in reagents.items():
-            ratio = ceil(required_qty / qty)
-            required_products[reagent_name] += ratio * reagent_amount
-    return required_products['ORE']
+    return get_planner(materials, reactions).required_ore(fuel_amount)
 
 ### Part II
 def compute_fuel_amount(materials, reactions, ore_amount=1000000000000):
@@ -103,15 +221,8 @@ def compute_fuel_amount(materials, reactions, ore_amount=1000000000000):
     :return: Amount of fuel that can be produced.
     :rtype: int
     '''
-    one_fuel_ores = required_ore(materials, reactions, fuel_amount=1)
-    target = ore_amount // one_fuel_ores
-    total_ores = required_ore(materials, reactions, fuel_amount=target)
-    while True:
-        target += (ore_amount - total_ores) // one_fuel_ores + 1
-        total_ores = required_ore(materials, reactions, fuel_amount=target)
-        if total_ores > ore_amount:
-            break
-    return target - 1
+    fuel, _ = get_planner(materials, reactions).max_fuel(ore_amount)
+    return fuel
 
 # [ Base tests ]
 # --------------
@@ -126,6 +237,10 @@ def make_tests():
 7 A, 1 D => 1 E
 7 A, 1 E => 1 FUEL''')
     assert required_ore(materials, reactions) == 31
+    assert get_planner(materials, reactions) is get_planner(materials, reactions)
+    # (modifying the reactions in-place gives a new planner)
+    reactions['FUEL'][0]['A'] = 10
+    assert required_ore(materials, reactions) == 41
     materials, reactions = parse_input('''9 ORE => 2 A
 8 ORE => 3 B
 7 ORE => 5 C
@@ -218,6 +333,9 @@ def make_tests():
 7 XCVML => 6 RJRHP
 5 BHXH, 4 VRPVC => 5 LTCX''')
     assert compute_fuel_amount(materials, reactions) == 460664
+    fuel, n_probes = ReactionPlanner(materials, reactions).max_fuel(1000000000000)
+    assert fuel == 460664
+    assert n_probes <= 2 * fuel.bit_length() + 1
 
 if __name__ == '__main__':
     # check function results on example cases
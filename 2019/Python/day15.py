@@ -5,14 +5,13 @@
 ### Day 15: Oxygen System
 ### =============================================
 import os
-from collections import defaultdict
-from queue import Queue
-from copy import copy
 
 import numpy as np
 from PIL import Image
 
 from intcode import IntcodeProgram
+from graph import DistanceMap, astar, iter_bfs, reconstruct_path
+from grid import Grid, render_chars, scale_image
 
 # [ Input parsing functions ]
 # ---------------------------
@@ -68,7 +67,7 @@ class MazeSolver(object):
         :type export_size: None or tuple(int, int) or list(int, int)
         '''
         self.program = program
-        self.board = {}
+        self.board = Grid()
         self.board[start_position] = 1
         self.visited = set()
         self.start_x, self.start_y = start_position
@@ -76,9 +75,10 @@ class MazeSolver(object):
         
         self._export = export
         self._export_iter = 0
+        self._export_width = self._export_height = None
         if isinstance(export_size, tuple) or isinstance(export_size, list):
             self._export_width, self._export_height = export_size
-        self._last_export = {}
+        self._last_export = 0
         self._last_path = []
         self._export_mode = None
         
@@ -108,7 +108,7 @@ class MazeSolver(object):
 
     def get_neighbors(self, x, y):
         '''Get the neighbor tiles of a tile at a given (x, y) position, ignoring
-        walls.
+        walls and unexplored tiles.
         
         :param x: Horizontal coordinate of the tile to search around of.
         :type x: int
@@ -117,13 +117,8 @@ class MazeSolver(object):
         :return: List of neighbors' positions.
         :rtype: list(tuple(int, int))
         '''
-        neighbors = []
-        for dir in range(1, 5):
-            neighbor_pos = MazeSolver.get_neighbor_position(x, y, dir)
-            v = self.board.get(neighbor_pos, None)
-            if v == 1 or v == 2:
-                neighbors.append(neighbor_pos)
-        return neighbors
+        board = self.board
+        return [ n for n in board.neighbors((x, y)) if board.get(n, 0) != 0 ]
         
     def print_board(self, path=[]):
         '''Prints the board of the maze in the shell.
@@ -132,21 +127,40 @@ class MazeSolver(object):
             "." character on the map.
         :type path: list(tuple(int, int))
         '''
-        # find the current board boundaries
-        x, y = zip(*list(self.board.keys()))
-        min_x, max_x = min(x), max(x)
-        min_y, max_y = min(y), max(y)
-        # print the grid
-        for y in range(min_y, max_y+1):
-            row = ''
-            for x in range(min_x, max_x+1):
-                if x == self.start_x and y == self.start_y:
-                    row += MazeSolver.DISPLAY_MAP['start']
-                elif (x, y) in path and (x, y) != self.target_position:
-                    row += '.'
-                else:
-                    row += MazeSolver.DISPLAY_MAP[self.board.get((x, y), None)]
-            print(row)
+        chars = self.board.lookup(MazeSolver.tile_values(MazeSolver.DISPLAY_MAP),
+            MazeSolver.DISPLAY_MAP[None])
+        self.draw_overlay(chars, path, '.', MazeSolver.DISPLAY_MAP['start'])
+        print(render_chars(chars))
+        
+    @staticmethod
+    def tile_values(table):
+        '''Gets the entries of a display or export table that correspond to
+        actual tiles (and not to unknown tiles or overlays).
+        
+        :param table: Display or export table.
+        :type table: dict
+        :return: Entries for the tile values.
+        :rtype: dict(int, any)
+        '''
+        return { k: v for k, v in table.items() if isinstance(k, int) }
+        
+    def draw_overlay(self, cells, path, path_value, start_value):
+        '''Draws the current path and the start position over the cells of the
+        board (as returned by the Grid.lookup() method).
+        
+        :param cells: Cells of the board to draw on.
+        :type cells: np.array
+        :param path: List of positions in the current path.
+        :type path: list(tuple(int, int))
+        :param path_value: Value to draw on the path.
+        :type path_value: any
+        :param start_value: Value to draw on the start position.
+        :type start_value: any
+        '''
+        for position in path:
+            if position != self.target_position:
+                cells[self.board.to_index(position)] = path_value
+        cells[self.board.to_index((self.start_x, self.start_y))] = start_value
     
     def export_board(self, path=[], scale=10):
         '''Saves the board as a .jpg image (the file name is determined by the
@@ -160,41 +174,27 @@ class MazeSolver(object):
         :type scale: int
         '''
         # for explore mode: check if board is the same (avoid exporting same
-        # board multiple times)
-        if self._export_mode == 'explore' and \
-            self.board.keys() == self._last_export.keys():
+        # board multiple times - since tiles are only discovered, comparing the
+        # number of known tiles is enough)
+        n_known = int(np.count_nonzero(self.board.data != self.board.fill))
+        if self._export_mode == 'explore' and n_known == self._last_export:
             return
-        self._last_export = { k: v for k, v in self.board.items() }
-        # get coordinates extrema
-        x, y = zip(*list(self.board.keys()))
-        min_x, max_x = min(x), max(x)
-        min_y, max_y = min(y), max(y)
-        # if no size is provided, get the image boundaries
-        if self._export_width is None or self._export_height is None:
-            w = (max_x - min_x + 1)
-            h = (max_y - min_y + 1)
-        else:
-            w = self._export_width
-            h = self._export_height
-        # apply export scale
-        w *= scale
-        h *= scale
-        # create the grid as a NumPy array (with export scale)
-        arr = np.zeros((h, w, 3))
-        for (x, y), marker in self.board.items():
-            if x == self.start_x and y == self.start_y:
-                mr, mg, mb = MazeSolver.EXPORT_MAP['start']
-            elif (x, y) in path and (x, y) != self.target_position:
-                mr, mg, mb = MazeSolver.EXPORT_MAP['path']
-            else:
-                mr, mg, mb = MazeSolver.EXPORT_MAP[marker]
-            x -= min_x
-            y -= min_y
-            arr[scale*y:scale*(y+1), scale*x:scale*(x+1), 0] = mr
-            arr[scale*y:scale*(y+1), scale*x:scale*(x+1), 1] = mg
-            arr[scale*y:scale*(y+1), scale*x:scale*(x+1), 2] = mb
-        # export as a JPG image
-        img = Image.fromarray(arr.astype(np.uint8)).convert('RGB')
+        self._last_export = n_known
+        # get the colors of the tiles
+        colors = self.board.lookup(MazeSolver.tile_values(MazeSolver.EXPORT_MAP),
+            MazeSolver.EXPORT_MAP[None])
+        self.draw_overlay(colors, path, MazeSolver.EXPORT_MAP['path'],
+            MazeSolver.EXPORT_MAP['start'])
+        # if a size is provided, place the tiles on a canvas of this size
+        if self._export_width is not None and self._export_height is not None:
+            canvas = np.zeros((self._export_height, self._export_width, 3))
+            h = min(colors.shape[0], self._export_height)
+            w = min(colors.shape[1], self._export_width)
+            canvas[:h, :w] = colors[:h, :w]
+            colors = canvas
+        # export as a JPG image (with export scale)
+        arr = scale_image(colors.astype(np.uint8), scale)
+        img = Image.fromarray(arr).convert('RGB')
         if self._export_mode == 'explore':
             dir = MazeSolver.EXPORT_DIR_EXPLORE
         elif self._export_mode == 'path':
@@ -265,7 +265,7 @@ class MazeSolver(object):
         
     def find_shortest_path(self, source=None, target=None):
         '''Finds the shortest path between two positions in the maze board by
-        applying Dijkstra's algorithm.
+        applying Dijkstra's algorithm (in its A* variant).
         
         :param source: If not null, start position of the path. Else, the start
             position that was stored for the MazeSolver instance is taken.
@@ -288,40 +288,19 @@ class MazeSolver(object):
         if target is None:
             target = self.target_position
             
-        shortest_paths = { source: (None, 0) }
-        current_position = source
-        visited = set()
+        # compute the shortest path with an A* search (using the Manhattan
+        # distance as heuristic)
+        bounds = self.board.bounds()
+        distances, parents = astar(source, target,
+            lambda p: self.get_neighbors(*p), bounds)
+        path = reconstruct_path(distances, parents, target)
+        if path is None:
+            return None
         
-        # compute shortest paths for each position
-        while current_position != target:
-            visited.add(current_position)
-            neighbors = self.get_neighbors(*current_position)
-            current_weight = shortest_paths[current_position][1]
-            for neighbor in neighbors:
-                weight = current_weight + 1
-                if neighbor not in shortest_paths:
-                    shortest_paths[neighbor] = (current_position, weight)
-                else:
-                    current_shortest_weight = shortest_paths[neighbor][1]
-                    if current_shortest_weight > weight:
-                        shortest_paths[neighbor] = (current_position, weight)
-                        
-            destinations = { pos: shortest_paths[pos] for pos in shortest_paths \
-                if pos not in visited }
-            if not destinations:
-                return None
-            current_position = min(destinations, key=lambda x: destinations[x][1])
-        
-        # work back through destinations in shortest path
-        path = []
-        while current_position is not None:
-            if self._export:
-                self.export_board(path=path)
-            path.append(current_position)
-            next_position = shortest_paths[current_position][0]
-            current_position = next_position
-        # reverse path
-        path = path[::-1]
+        # (export the path, from the target back to the source)
+        if self._export:
+            for i in range(len(path)):
+                self.export_board(path=path[len(path)-i:])
 
         self._export_mode = None
         return path
@@ -359,21 +338,12 @@ class MazeSolver(object):
         :rtype: int
         '''
         iterations = 0
-        # tiles to check (store the target position initially)
-        to_check = Queue()
-        to_check.put((self.target_position, 0))
-        self.board[self.target_position] = 3
-        # compute until there are no tiles left
-        while not to_check.empty():
-            # . get back tile information
-            pos, generation = to_check.get()
-            # . get all neighbors of the current position (only returns the
-            # ones that are empty, i.e. not already filled with oxygen)
-            neighbors = self.get_neighbors(*pos)
-            # . for each, fill it and add it to the queue of positions
-            for neighbor in neighbors:
-                self.board[neighbor] = 3
-                to_check.put((neighbor, generation + 1))
+        # fill the board with a BFS starting from the target position (the
+        # distance map stores the generation at which each tile was filled)
+        distances = DistanceMap(self.board.bounds())
+        for pos, generation in iter_bfs(self.target_position,
+            lambda p: self.get_neighbors(*p), distances):
+            self.board[pos] = 3
             # (export the board?)
             if self._export:
                 self.export_board()
@@ -4,6 +4,7 @@
 ### ---------------------------------------------
 ### Day 16: Flawed Frequency Transmission
 ### =============================================
+import numpy as np
 from tqdm import tqdm
 
 # [ Input parsing functions ]
@@ -18,45 +19,162 @@ def parse_input(data):
     '''
     return [ int(x) for x in data.strip() ]
 
+class RepeatedSignal(object):
+    
+    '''Util class to represent a signal made of a base list of digits repeated
+    a given number of times, without building it: the digit at a given index
+    is read in the base digits at this index modulo the base length.'''
+    
+    def __init__(self, base, repeat):
+        '''Initialization function for a new RepeatedSignal.
+        
+        :param base: Base digits of the signal.
+        :type base: list(int)
+        :param repeat: Number of times the base digits are repeated.
+        :type repeat: int
+        '''
+        self.base = np.array(base, dtype=np.uint8)
+        self.repeat = repeat
+        
+    def __len__(self):
+        return len(self.base) * self.repeat
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, end, step = index.indices(len(self))
+            if step == 1:
+                return self.materialize(start, end)
+            return self.base[np.arange(start, end, step) % len(self.base)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('signal index out of range')
+        return int(self.base[index % len(self.base)])
+        
+    def materialize(self, start=0, end=None):
+        '''Builds a part of the signal as a contiguous buffer of bytes. The
+        buffer is filled by doubling: once it contains a whole number of
+        periods, its beginning is copied after itself.
+        
+        :param start: Index of the first digit to get.
+        :type start: int
+        :param end: If not None, index of the end of the part to get. Else,
+            the part stops at the end of the signal.
+        :type end: int
+        :return: Digits of the signal part.
+        :rtype: np.array(np.uint8)
+        '''
+        n = len(self.base)
+        if end is None:
+            end = len(self)
+        count = max(0, end - start)
+        buffer = np.empty(count, dtype=np.uint8)
+        filled = min(n, count)
+        buffer[:filled] = np.roll(self.base, -(start % n))[:filled]
+        while filled < count:
+            c = min(filled, count - filled)
+            buffer[filled:filled+c] = buffer[:c]
+            filled += c
+        return buffer
+
 # [ Computation functions ]
 # -------------------------
+def get_cumsum_values(cumsum, first, step, count):
+    '''Gets values in the cumulative sum of the inputs at indices that form an
+    arithmetic progression (the indices that go past the end of the inputs are
+    truncated, i.e. they get the total sum). The values are read with a strided
+    slice rather than a fancy indexing.
+    
+    :param cumsum: Cumulative sum of the inputs (with a leading 0).
+    :type cumsum: np.array(int)
+    :param first: First index of the progression.
+    :type first: int
+    :param step: Step of the progression.
+    :type step: int
+    :param count: Number of indices in the progression.
+    :type count: int
+    :return: Values of the cumulative sum.
+    :rtype: np.array(int)
+    '''
+    n = len(cumsum) - 1
+    values = np.empty(count, dtype=cumsum.dtype)
+    c = 0 if first > n else min(count, (n - first) // step + 1)
+    values[:c] = cumsum[first:first + step*(c-1) + 1:step]
+    values[c:] = cumsum[n]
+    return values
+
+def compute_tail_phase(tail):
+    '''Computes the next phase of the end of the inputs (in-place), assuming
+    that it starts after the middle of the inputs: each digit is then the sum
+    of itself and all the next digits (i.e. a reversed cumulative sum).
+    
+    :param tail: End of the inputs.
+    :type tail: np.array(np.uint8)
+    '''
+    tail[:] = np.cumsum(tail[::-1], dtype=np.uint32)[::-1] % 10
+
 def compute_phase(inputs, skip_digits=None):
     '''Computes the next phase by applying the pattern to the given inputs.
     
+    In the full computation, the pattern for the digit of index idx is made of
+    blocks of length l = idx+1 with a positive contribution starting at
+    idx + 4kl and a negative one starting at idx + 2l + 4kl. Each block sum is a
+    difference of two values in the cumulative sum of the inputs, and all the
+    block sums are evaluated with NumPy: for the first digits (with many small
+    blocks), all the blocks of a digit at once; for the other digits (with few
+    large blocks), the k-th blocks of all digits at once.
+    
     :param inputs: Current inputs to apply the pattern to.
-    :type inputs: list(int)
+    :type inputs: list(int) or np.array(int)
     :param skip_digits: Number of digits to skip in the computation. The
         function assumes that if this variable is not None, then it is greater
         than or equal to half of the length of inputs.
     :type skip_digits: int
     :return: New phase state.
-    :rtype: list(int)
+    :rtype: list(int) or np.array(int)
     '''
     n = len(inputs)
     # compute the full result
     if skip_digits is None:
-        output = []
-        for idx in range(n):
-            s = 0
-            l = idx+1
-            # apply the pattern on the inputs: either positive (+1) or negative (-1)
-            # contribution from some parts of the inputs
-            i = idx
-            while i < n:
-                s += sum(inputs[i:i+l]) - sum(inputs[i+2*l:i+3*l])
-                i += 4*l
-            # keep only ones digit
-            d = int(str(s)[-1])
-            output.append(d)
+        cumsum = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(inputs, out=cumsum[1:])
+        output = np.zeros(n, dtype=np.int64)
+        threshold = min(n, int(np.sqrt(n)) + 1)
+        # . small blocks: process each digit (all blocks at once)
+        for idx in range(threshold):
+            l = idx + 1
+            count = (n - idx + 4*l - 1) // (4*l)
+            output[idx] = get_cumsum_values(cumsum, idx + l, 4*l, count).sum() \
+                - get_cumsum_values(cumsum, idx, 4*l, count).sum() \
+                - get_cumsum_values(cumsum, idx + 3*l, 4*l, count).sum() \
+                + get_cumsum_values(cumsum, idx + 2*l, 4*l, count).sum()
+        # . large blocks: process each block rank (all digits at once)
+        k = 0
+        while True:
+            # (last digit that has a k-th block)
+            last = (n - 4*k - 1) // (4*k + 1)
+            if last < threshold:
+                break
+            # (the k-th block of digit idx starts at (4k+1)idx + 4k, and the
+            # 4 block boundaries are arithmetic progressions over the digits)
+            count = last - threshold + 1
+            start = (4*k + 1) * threshold + 4*k
+            output[threshold:last+1] += \
+                get_cumsum_values(cumsum, start + threshold + 1, 4*k + 2, count) \
+                - get_cumsum_values(cumsum, start, 4*k + 1, count) \
+                - get_cumsum_values(cumsum, start + 3*(threshold + 1), 4*k + 4,
+                    count) \
+                + get_cumsum_values(cumsum, start + 2*(threshold + 1), 4*k + 3,
+                    count)
+            k += 1
+        # keep only ones digit
+        output = np.abs(output) % 10
     # or skip ahead to only compute the end (assumes that the skip index is
     # greather than or equal to half of the inputs length)
     else:
-        output = [0] * n
-        output[-1] = inputs[-1]
-        i = n - 2
-        for idx in range(n-2, skip_digits - 1, -1):
-            output[idx] = (output[idx+1] + inputs[i]) % 10
-            i -= 1
+        output = np.zeros(n, dtype=np.uint8)
+        output[skip_digits:] = np.asarray(inputs[skip_digits:], dtype=np.uint8)
+        compute_tail_phase(output[skip_digits:])
     return output
 
 ### Part I
@@ -82,13 +200,13 @@ def compute_phases(n_phases, inputs, only_eight_digits=False, debug=False):
     if debug:
         iterator = tqdm(iterator, total=n_phases)
     # compute iterations
-    current = inputs
+    current = np.array(inputs, dtype=np.int64)
     for _ in iterator:
         current = compute_phase(current)
     # return full output or just the first eight digits as a string
     if only_eight_digits:
         return ''.join([ str(x) for x in current[:8] ])
-    return current
+    return current.tolist()
 
 ### Part II
 def compute_phases_nohead(n_phases, inputs, skip_digits, only_eight_digits=False,
@@ -98,34 +216,110 @@ def compute_phases_nohead(n_phases, inputs, skip_digits, only_eight_digits=False
     number of digits from the start. It assumes that the number of passed digits
     is greater than or equal to half of the length of initial inputs.
     
+    Only the end of the inputs is built, as a buffer of bytes that is updated
+    in-place at each phase.
+    
     :param n_phases: Number of phases to compute.
     :type n_phases: int
     :param inputs: Initial problem input to process.
-    :type inputs: list(int)
+    :type inputs: list(int) or RepeatedSignal
     :param skip_digits: Number of digits to skip in the final result.
     :type skip_digits: int
     :param only_eight_digits: Whether or not to return only the first eight
-        digits of the result (as a string) or the full result (as a list of
-        inputs).
+        digits of the result (as a string) or the end of the final state (as
+        an array of digits, starting after the skipped digits).
     :type only_eight_digits: bool
     :param debug: Whether or not to display a progress bar during the
         computation.
     :type debug: bool
     :return: Final state of the inputs after all the phases have been computed.
-    :rtype: str or list(int)
+    :rtype: str or np.array(np.uint8)
     '''
     iterator = range(n_phases)
     if debug:
         iterator = tqdm(iterator, total=n_phases)
+    # build the end of the inputs
+    if isinstance(inputs, RepeatedSignal):
+        current = inputs.materialize(skip_digits)
+    else:
+        current = np.array(inputs[skip_digits:], dtype=np.uint8)
     # compute iterations
-    current = inputs
     for _ in iterator:
-        current = compute_phase(current, skip_digits=skip_digits)
+        compute_tail_phase(current)
     # return full output or just the first eight digits as a string
     if only_eight_digits:
-        return ''.join([ str(x) for x in current[skip_digits:skip_digits+8] ])
+        return ''.join([ str(x) for x in current[:8] ])
     return current
 
+# binomial coefficients C(a, b) mod 5 for 0 <= a, b < 5 (Lucas' theorem)
+BINOMIALS_MOD5 = np.array([ [ 1, 0, 0, 0, 0 ], [ 1, 1, 0, 0, 0 ],
+    [ 1, 2, 1, 0, 0 ], [ 1, 3, 3, 1, 0 ], [ 1, 4, 1, 4, 1 ] ], dtype=np.int64)
+
+def binomial_mod10(m, r):
+    '''Computes the binomial coefficients C(m, r) mod 10 for an array of m and
+    a fixed r. Thanks to Lucas' theorem, C(m, r) mod p (for a prime p) is the
+    product of the C(m_i, r_i) mod p where m_i and r_i are the digits of m and
+    r in base p. The results mod 2 and mod 5 are then combined with the Chinese
+    remainder theorem: x = 5a + 6b mod 10 if x = a mod 2 and x = b mod 5.
+    
+    :param m: Values of m.
+    :type m: np.array(int)
+    :param r: Value of r.
+    :type r: int
+    :return: Binomial coefficients mod 10.
+    :rtype: np.array(int)
+    '''
+    # . mod 2: C(m, r) is odd if and only if the bits of r are all in m
+    mod2 = ((m & r) == r).astype(np.int64)
+    # . mod 5: product of the binomial coefficients of the base-5 digits
+    mod5 = np.ones_like(m)
+    while r > 0:
+        mod5 = mod5 * BINOMIALS_MOD5[m % 5, r % 5] % 5
+        m = m // 5
+        r = r // 5
+    return (5 * mod2 + 6 * mod5) % 10
+
+def compute_phases_binomial(n_phases, inputs, skip_digits, repeat=10000,
+    n_digits=8):
+    '''Computes some digits of the final phase directly, without computing the
+    intermediate phases. It assumes that the number of skipped digits is
+    greater than or equal to half of the length of the repeated inputs: in
+    this case, a digit is the sum of all the next digits of the previous phase
+    and after k phases, the digit of index i is:
+    
+        sum(C(j - i + k - 1, k - 1) * inputs[j] for j >= i) mod 10
+        
+    The repeated inputs are never built (the digit of index j is simply the
+    digit of index j % n in the base inputs) and the coefficients are computed
+    in chunks, so the memory is proportional to the length of the base inputs.
+    
+    :param n_phases: Number of phases to compute.
+    :type n_phases: int
+    :param inputs: Initial problem input to process (before repetition).
+    :type inputs: list(int)
+    :param skip_digits: Number of digits to skip in the final result.
+    :type skip_digits: int
+    :param repeat: Number of times the inputs are repeated.
+    :type repeat: int
+    :param n_digits: Number of digits to compute.
+    :type n_digits: int
+    :return: Requested digits of the final phase (as a string).
+    :rtype: str
+    '''
+    base = np.array(inputs, dtype=np.int64)
+    n = len(base)
+    tail = n * repeat - skip_digits
+    chunk = n * max(1, 65536 // n)
+    totals = np.zeros(n_digits, dtype=np.int64)
+    for start in range(0, tail, chunk):
+        d = np.arange(start, min(start + chunk, tail), dtype=np.int64)
+        coefficients = binomial_mod10(d + n_phases - 1, n_phases - 1)
+        for t in range(n_digits):
+            valid = d < tail - t
+            digits = base[(skip_digits + t + d[valid]) % n]
+            totals[t] += (coefficients[valid] * digits).sum() % 10
+    return ''.join([ str(x) for x in totals % 10 ])
+
 # [ Base tests ]
 # --------------
 def make_tests():
@@ -141,6 +335,22 @@ def make_tests():
     assert ''.join([ str(x) for x in p ]).startswith('73745418')
     assert compute_phases(100, [ 6,9,3,1,7,1,6,3,4,9,2,9,4,8,6,0,6,3,3,5,9,9,5,
         9,2,4,3,1,9,8,7,3 ], only_eight_digits=True) == '52432133'
+
+    ### Part II
+    for data, result in [ ('03036732577212944063491565474664', '84462026'),
+        ('02935109699940807407585447034323', '78725270'),
+        ('03081770884921959731165446850517', '53553731') ]:
+        assert compute_phases_binomial(100, parse_input(data),
+            skip_digits=int(data[:7])) == result
+        assert compute_phases_nohead(100, RepeatedSignal(parse_input(data),
+            10000), skip_digits=int(data[:7]), only_eight_digits=True) == result
+    signal = RepeatedSignal([ 1,2,3,4,5,6,7,8 ], 3)
+    assert len(signal) == 24
+    assert signal[9] == 2 and signal[-1] == 8
+    assert signal[::-7].tolist() == [ 8,1,2,3 ]
+    assert signal.materialize(5, 19).tolist() == [ 6,7,8,1,2,3,4,5,6,7,8,1,2,3 ]
+    assert compute_phase([ 1,2,3,4,5,6,7,8 ], skip_digits=4).tolist()[4:] \
+        == [ 6,1,5,8 ]
     
 if __name__ == '__main__':
     # check function results on example cases
@@ -156,8 +366,6 @@ if __name__ == '__main__':
     print('PART I: solution = {}'.format(solution))
     
     ### PART II
-    inp = [ item for _ in range(10000) for item in inputs ]
-    solution = compute_phases_nohead(100, inp, only_eight_digits=True,
-        skip_digits=int(data[:7]), debug=True)
+    solution = compute_phases_binomial(100, inputs, skip_digits=int(data[:7]))
     print('PART II: solution = {}'.format(solution))
     
@@ -5,11 +5,15 @@
 ### Day 17: Set and Forget
 ### =============================================
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 import numpy as np
 from PIL import Image
 
-from intcode import IntcodeProgram
+from intcode import IntcodeCore, AsciiOutput, STEP_OUTPUT
+from grid import Grid, NEIGHBOR_OFFSETS, scale_image, shifted
 
 # [ Input parsing functions ]
 # ---------------------------
@@ -25,8 +29,21 @@ def parse_input(data):
 
 # [ Computation functions ]
 # -------------------------
-### Part I
-def get_map(inputs, display=False, debug=False):
+TILE_CODES = { ord('#'): 1, ord('^'): 2, ord('>'): 3, ord('v'): 4, ord('<'): 5 }
+def parse_map(map):
+    '''Gets a simple map with only the scaffolds and the robot from the camera
+    view (empty space is 0, scaffolds are 1 and the robot is 2 to 5 depending
+    on its direction).
+    
+    :param map: Camera view of the scaffolds.
+    :type map: str
+    :return: Simplified map.
+    :rtype: Grid
+    '''
+    chars = Grid.from_lines(map.strip().split('\n'), fill=ord('.'))
+    return Grid.from_array(chars.lookup(TILE_CODES, 0).astype(np.int8), fill=0)
+
+def get_map(inputs, display=False):
     '''Executes the Intcode program on the provided inputs and finds out the
     required number of moves to reach the oxygen system in the room.
     
@@ -34,40 +51,18 @@ def get_map(inputs, display=False, debug=False):
     :type inputs: list(int)
     :param display: Whether or not to display the map at the end of the scan.
     :type display: bool
-    :param debug: Whether or not the IntcodeProgram should debug its
-        execution at each instruction processing.
-    :type debug: bool
     :return: Current map of the scaffolds and simplified map.
-    :rtype: list(str), dict(tuple(int, int), int)
+    :rtype: str, Grid
     '''
-    # prepare the program instance to read the given inputs as an Intcode
-    # program
-    program = IntcodeProgram(inputs, debug=debug)
+    # prepare the program core to read the given inputs as an Intcode program
+    core = IntcodeCore(inputs)
     # run the program to get the current map
-    program.run()
-    map = [ chr(x) for x in program.output ]
+    core.run()
+    output = AsciiOutput()
+    output.drain(core)
+    map = output.text()
 
-    # get simple map with only the coordinates of the scaffolds and of the robot
-    # (ignore empty space)
-    simple_map = {}
-    # . get map (width, height) dimensions
-    w = map.index('\n')
-    h = len(map) // w
-    # . remove new lines from map to avoid offset
-    m = [ item for item in map if item != '\n' ]
-    for y in range(h):
-        for x in range(w):
-            v = m[x + y * w]
-            if v == '#':
-                simple_map[(x, y)] = 1
-            elif v == '^':
-                simple_map[(x, y)] = 2
-            elif v == '>':
-                simple_map[(x, y)] = 3
-            elif v == 'v':
-                simple_map[(x, y)] = 4
-            elif v == '<':
-                simple_map[(x, y)] = 5
+    simple_map = parse_map(map)
     
     # optionally display the map
     if display:
@@ -79,9 +74,9 @@ def display_map(map):
     '''Displays the map in the shell.
     
     :param map: Map to display.
-    :type map: list(str)
+    :type map: str
     '''
-    print(''.join(map))
+    print(map)
 
 EXPORT_DIR = os.path.join(os.getcwd(), 'day17')
 EXPORT_MAP = {
@@ -93,95 +88,134 @@ def export_map(iter, map, export_size=None, scale=20):
     current iteration number: "{iter}.jpg"). The function also applies a
     scale to make the image bigger and thus more readable.
     
-    :param path: List of positions in the current path to show with a
-        different color on the map.
-    :type path: list(tuple(int, int))
+    :param iter: Iteration number of the export.
+    :type iter: int
+    :param map: Camera view of the scaffolds.
+    :type map: str or bytes
+    :param export_size: If not None, size of the exported map (width, height).
+    :type export_size: tuple(int, int)
     :param scale: Export scale to apply to the image.
     :type scale: int
     '''
-    # if no size is provided, get the image boundaries
-    if export_size is None:
-        init_w = map.index('\n')
-        init_h = len(map) // init_w
-    else:
-        init_w, init_h = export_size
-    # apply export scale
-    w = init_w * scale
-    h = init_h * scale
-    # create the grid as a NumPy array (with export scale)
-    m = [ item for item in map if item != '\n' ]
-    arr = np.zeros((h, w, 3))
-    for y in range(init_h):
-        for x in range(init_w):
-            marker = m[x + y * init_w]
-            mr, mg, mb = EXPORT_MAP[marker]
-            arr[scale*y:scale*(y+1), scale*x:scale*(x+1), 0] = mr
-            arr[scale*y:scale*(y+1), scale*x:scale*(x+1), 1] = mg
-            arr[scale*y:scale*(y+1), scale*x:scale*(x+1), 2] = mb
-    # export as a JPG image
-    img = Image.fromarray(arr.astype(np.uint8)).convert('RGB')
+    # get the colors of the tiles
+    if isinstance(map, bytes):
+        map = map.decode('ascii')
+    chars = Grid.from_lines(map.strip().split('\n'), fill=ord('.'))
+    colors = chars.lookup({ ord(k): v for k, v in EXPORT_MAP.items() },
+        EXPORT_MAP['.'])
+    # if a size is provided, place the tiles on a canvas of this size
+    if export_size is not None:
+        w, h = export_size
+        canvas = np.zeros((h, w, 3))
+        h, w = min(h, colors.shape[0]), min(w, colors.shape[1])
+        canvas[:h, :w] = colors[:h, :w]
+        colors = canvas
+    # export as a JPG image (with export scale)
+    arr = scale_image(colors.astype(np.uint8), scale)
+    img = Image.fromarray(arr).convert('RGB')
     img.save(os.path.join(EXPORT_DIR, '{}.jpg'.format(iter)))
     
+class FrameExporter(object):
+    
+    '''Util class to export the frames of the video feed asynchronously: each
+    frame is handed to a background thread as soon as it is complete, so that
+    the rendering and the saving of the images overlap with the execution of
+    the program. At most a few frames are waiting to be exported at any time
+    (the producer waits for the oldest export to finish otherwise), which
+    bounds the memory used by the pending frames.'''
+    
+    def __init__(self, export_function=None, max_pending=2):
+        '''Initialization function for a new FrameExporter.
+        
+        :param export_function: Function to call on each frame (with the frame
+            index and the frame). If None, the frames are exported as images.
+        :type export_function: func
+        :param max_pending: Maximum number of frames waiting to be exported.
+        :type max_pending: int
+        '''
+        self.export_function = export_function or export_map
+        self.max_pending = max_pending
+        self.n_frames = 0
+        self._pending = deque()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, type, value, traceback):
+        self.close()
+        
+    def submit(self, frame):
+        '''Hands a frame over to the background exporter.
+        
+        :param frame: Frame to export.
+        :type frame: bytes
+        '''
+        if len(self._pending) >= self.max_pending:
+            # (also re-raises the errors of the export, if any)
+            self._pending.popleft().result()
+        self._pending.append(self._executor.submit(self.export_function,
+            self.n_frames, frame))
+        self.n_frames += 1
+        
+    def close(self):
+        '''Waits for all the pending exports to finish.'''
+        try:
+            while self._pending:
+                self._pending.popleft().result()
+        finally:
+            self._executor.shutdown()
+    
 ### Part I
 def get_intersections_checksum(simple_map):
     '''Gets the checksum of all the intersections on the given map.
     
     :param simple_map: Map to display.
-    :type simple_map: dict(tuple(int, int), int)
+    :type simple_map: Grid
     :return: Checksum of the intersections.
     :rtype: int
     '''
-    # find intersection on the map and compute their checksum    
-    intersections = {}
-    for x, y in simple_map:
-        if (x-1, y) in simple_map and (x+1, y) in simple_map \
-            and (x, y-1) in simple_map and (x, y+1) in simple_map:
-            intersections[(x, y)] = x * y
+    # find intersections on the map, i.e. scaffolds whose 4 neighbors are
+    # scaffolds too, and compute their checksum
+    scaffolds = simple_map.to_array() > 0
+    intersections = scaffolds.copy()
+    for dx, dy in NEIGHBOR_OFFSETS:
+        intersections &= shifted(scaffolds, dx, dy)
+    y, x = np.nonzero(intersections)
     # return total checksum
-    return sum(intersections.values())
+    return int(np.sum((x + simple_map.min_x) * (y + simple_map.min_y)))
     
 ### Part II
 def encode_movement(movement):
     '''Encodes a set of moves into the correct format to feed the program (i.e.
-    convert to ASCII value and add a newline).
+    convert to ASCII bytes and add a newline).
     
     :param movement: Set of moves to convert.
-    :type movement: list(str)
+    :type movement: str
     :return: Encoded movement.
-    :type: list(int)
+    :type: bytes
     '''
-    return [ ord(c) for c in movement ] + [ 10 ]
+    return movement.encode('ascii') + b'\n'
 
 DIRECTION_DELTAS = { 2: (0, -1), 3: (1, 0), 4: (0, 1), 5: (-1, 0) }
 DIRECTION_POSSIBILITES = { 2: (5, 2, 3), 3: (2, 3, 4), 4: (3, 4, 5), 5: (4, 5, 2) }
-def save_robots(simple_map, inputs, export=False, debug=False):
-    '''Saves the robots by walking on the scaffolds, and also collects dust.
+def compute_path(simple_map):
+    '''Computes the full path the robot needs to take to walk on each scaffold
+    at least once, as a list of turns and numbers of steps.
     
     :param simple_map: Map to walk.
-    :type simple_map: dict(tuple(int, int), int)
-    :param inputs: List of integers to execute as an Intcode program.
-    :type inputs: list(int)
-    :param export: Whether or not to ask for a continuous video feed and to
-        export the resulting images.
-    :type export: bool
-    :param debug: Whether or not the IntcodeProgram should debug its
-        execution at each instruction processing.
-    :type debug: bool
-    :return: Amount of dust collected during the process.
-    :rtype: int
+    :type simple_map: Grid
+    :return: Path of the robot (e.g. "L,12,R,4").
+    :rtype: str
     '''
-    # prepare the program instance to read the given inputs as an Intcode
-    # program
-    program = IntcodeProgram(inputs, debug=debug)
-    # force the robot to wake up
-    program.program[0] = 2
-    
-    # get full path
-    (x, y), dir = [ (k, v) for k, v in simple_map.items() if v != 1 ][0]
+    robot = np.flatnonzero(simple_map.data > 1)[0]
+    x, y = simple_map.position(robot)
+    dir = int(simple_map.data.flat[robot])
+    n_scaffolds = int(np.count_nonzero(simple_map.data))
     visited = set([ (x, y) ])
     path = []
     steps = 0
-    while len(visited) != len(simple_map):
+    while len(visited) != n_scaffolds:
         # get all possible directions from current state (the robot cannot make
         # a U-turn!)
         possible_dirs = DIRECTION_POSSIBILITES[dir]
@@ -215,69 +249,187 @@ def save_robots(simple_map, inputs, export=False, debug=False):
         else:
             steps += 1
         visited.add((x, y))
+    # add the steps of the last move
+    if len(path) > 0 and (path[-1] == 'L' or path[-1] == 'R'):
+        path.append(str(steps + 1))
+    return ','.join(path)
+
+def compress_path(path_str, n_routines=3, max_length=20):
+    '''Splits a path into at most n_routines movement routines and a main
+    routine that calls them, so that each routine (main included) is at most
+    max_length characters long. The search is a recursive backtracking on the
+    moves (a move is a turn and a number of steps) that either reuses an
+    existing routine or creates a new one; the results are memoized and the
+    search is pruned when a routine or the main routine exceeds its length
+    budget.
     
-    if path[-1] == 'L' or path[-1] == 'R':
-        path = path[:-1]
-    path_str = ','.join(path)
-    print(path_str)
+    :param path_str: Path to compress.
+    :type path_str: str
+    :param n_routines: Maximum number of movement routines.
+    :type n_routines: int
+    :param max_length: Maximum number of characters in a routine.
+    :type max_length: int
+    :return: Main routine and list of movement routines, or None if the path
+        cannot be compressed.
+    :rtype: str, list(str)
+    '''
+    tokens = path_str.split(',')
+    moves = tuple([ ','.join(tokens[i:i+2]) for i in range(0, len(tokens), 2) ])
+    n = len(moves)
+    max_calls = (max_length + 1) // 2
+    
+    @lru_cache(maxsize=None)
+    def search(i, routines, n_calls):
+        # (end of the path: no more calls needed)
+        if i == n:
+            return (), routines
+        # (main routine budget exceeded)
+        if n_calls == max_calls:
+            return None
+        # try to reuse an existing routine
+        for r, routine in enumerate(routines):
+            if moves[i:i+len(routine)] == routine:
+                result = search(i + len(routine), routines, n_calls + 1)
+                if result is not None:
+                    return (r,) + result[0], result[1]
+        # try to create a new routine (as long as it fits the length budget)
+        if len(routines) < n_routines:
+            for j in range(i + 1, n + 1):
+                routine = moves[i:j]
+                if len(','.join(routine)) > max_length:
+                    break
+                result = search(j, routines + (routine,), n_calls + 1)
+                if result is not None:
+                    return (len(routines),) + result[0], result[1]
+        return None
+    
+    result = search(0, (), 0)
+    if result is None:
+        return None
+    calls, routines = result
+    main = ','.join([ 'ABC'[r] for r in calls ])
+    return main, [ ','.join(routine) for routine in routines ]
 
-    # movements = { 'A': [], 'B': [], 'C': [] }
-    # movement = ''
-    # c = 0
-    # for m in [ 'A', 'B', 'C' ]:
-    #     while movement in path_str[len(movement):]:
-    #         movement += path_str[c]
-    #         c += 1
-    #     movements[m] = movement
-    # print(movements)
-    # # A L,11,R,3,R,3,L,5,
-    # # B L,11,R,3,R,3,R,11,
-    # # A L,11,R,3,R,3,L,5,
-    # # C L,9,L,5,R,3,
-    # # A L,11,R,3,R,3,L,5,
-    # # B L,11,R,3,R,3,R,11,
-    # # C L,9,L,5,R,3,
-    # # B L,11,R,3,R,3,R,11,
-    # # C L,9,L,5,R,3,
-    # # A/B L,11,R,3,R,3
-    # 
-    # movements_chain = []
-    # for move, pattern in movements.items():
-    #     if path_str.startswith(pattern):
-    #         movements_chain.append(move)
-    #         path_str = path_str[len(move)-1:]
-    #         print(path_str)
-    # print(movements_chain)
-    # return
-    
-    # separate paths into subpatterns (done by hand)
-    A = encode_movement('L,12,R,4,R,4,L,6')
-    B = encode_movement('L,12,R,4,R,4,R,12')
-    C = encode_movement('L,10,L,6,R,4')
-    movements = encode_movement('A,B,A,C,A,B,C,B,C,A')
+def save_robots(simple_map, inputs, export=False, chunk_size=1024):
+    '''Saves the robots by walking on the scaffolds, and also collects dust.
+    
+    :param simple_map: Map to walk.
+    :type simple_map: Grid
+    :param inputs: List of integers to execute as an Intcode program.
+    :type inputs: list(int)
+    :param export: Whether or not to ask for a continuous video feed and to
+        export the resulting images.
+    :type export: bool
+    :param chunk_size: Number of outputs to produce between two parsings of
+        the video feed (the buffered output is bounded by one frame plus one
+        chunk).
+    :type chunk_size: int
+    :return: Amount of dust collected during the process.
+    :rtype: int
+    '''
+    # prepare the program core to read the given inputs as an Intcode program
+    core = IntcodeCore(inputs)
+    # force the robot to wake up
+    core.memory[0] = 2
+    
+    # get full path and separate it into subpatterns
+    path_str = compute_path(simple_map)
+    if path_str == '':
+        raise ValueError('The robot has no scaffold to walk on')
+    compressed = compress_path(path_str)
+    if compressed is None:
+        raise ValueError('Could not split the path into at most 3 movement '
+            'routines: {}'.format(path_str))
+    main, routines = compressed
+    # (unused routines still need to be given to the robot)
+    routines += [ routines[0] ] * (3 - len(routines))
         
-    # prepare movements
-    program.push_memory(movements)
-    program.push_memory(A)
-    program.push_memory(B)
-    program.push_memory(C)
-    program.push_memory([ ord('y' if export else 'n'), 10 ])
-    
-    # run the program to move the robot
-    program.run()
-    print('Finished computing.')
-    # export maps if need be
-    if export:
-        full_map = ''.join([ chr(x) for x in program.output ])
-        all_maps = [ m for m in full_map.split('\n\n') if len(m) > 0 and m[0] == '.' ]
-        if not os.path.exists(EXPORT_DIR):
-            os.makedirs(EXPORT_DIR)
-        for i, map in enumerate(all_maps):
-            export_map(i, map)
-    
-    return program.output[-1]
+    # prepare movements (as one ASCII payload)
+    core.push_ascii(b''.join([ encode_movement(m) for m in [ main ] + routines ]
+        + [ encode_movement('y' if export else 'n') ]))
+    
+    # run the program to move the robot (and parse the video feed frames as
+    # they arrive, to export them in the background)
+    output = AsciiOutput()
+    if export and not os.path.exists(EXPORT_DIR):
+        os.makedirs(EXPORT_DIR)
+    with FrameExporter() as exporter:
+        status = STEP_OUTPUT
+        while status == STEP_OUTPUT:
+            status = core.run(max_outputs=chunk_size)
+            output.drain(core)
+            for frame in output.frames():
+                # export maps if need be (skip the prompts)
+                if export and frame[:1] == b'.':
+                    exporter.submit(frame)
+            output.compact()
+        print('Finished computing.')
+    
+    return output.values[-1]
+    
+# [ Base tests ]
+# --------------
+def make_tests():
+    '''Performs tests on the provided examples to check the result of the
+    computation functions is ok.'''
+    ### Part I
+    simple_map = parse_map('\n'.join([
+        '..#..........', '..#..........', '#######...###', '#.#...#...#.#',
+        '#############', '..#...#...#..', '..#####...^..'
+    ]))
+    assert get_intersections_checksum(simple_map) == 76
+    
+    ### Part II
+    path_str = 'R,8,R,8,R,4,R,4,R,8,L,6,L,2,R,4,R,4,R,8,R,8,R,8,L,6,L,2'
+    main, routines = compress_path(path_str)
+    assert len(routines) <= 3
+    assert all([ len(r) <= 20 for r in [ main ] + routines ])
+    assert ','.join([ routines['ABC'.index(c)] for c in main.split(',') ]) \
+        == path_str
+    assert compress_path('R,8,L,4,R,8', n_routines=1, max_length=5) is None
+    try:
+        save_robots(parse_map('..^..'), [ 99 ])
+        assert False
+    except ValueError:
+        pass
+    
+    ### ASCII output
+    # (program that outputs 3 frames and a non-ASCII value, read by chunks of 2
+    # outputs so that the separators are cut)
+    feed = list(b'.#\n\n.\n\n#\n\n') + [ 651043 ]
+    core = IntcodeCore(sum([ [ 104, v ] for v in feed ], []) + [ 99 ])
+    output = AsciiOutput()
+    frames = []
+    while core.run(max_outputs=2) == STEP_OUTPUT:
+        output.drain(core)
+        frames.extend(output.frames())
+        output.compact()
+    output.drain(core)
+    assert frames == [ b'.#', b'.', b'#' ]
+    assert output.values == [ 651043 ] and len(output.buffer) == 0
+    # (values from 128 to 255 are bytes, but not ASCII characters)
+    core = IntcodeCore([ 104, ord('a'), 104, 200, 99 ])
+    core.run()
+    output = AsciiOutput()
+    output.drain(core)
+    assert output.text() == 'a' and output.values == [ 200 ]
+    # (the pending bytes are viewed in place)
+    with output.view() as pending:
+        assert pending.obj is output.buffer and pending.tobytes() == b'a'
+    output.compact()
+    
+    ### Asynchronous export
+    exported = []
+    with FrameExporter(lambda i, frame: exported.append((i, frame)),
+        max_pending=1) as exporter:
+        for frame in frames:
+            exporter.submit(frame)
+    assert exported == [ (0, b'.#'), (1, b'.'), (2, b'#') ]
     
 if __name__ == '__main__':
+    # check function results on example cases
+    make_tests()
+    
     # get input data
     data_path = '../data/day17.txt'
     inputs = parse_input(open(data_path, 'r').read())    
@@ -4,7 +4,11 @@
 ### ---------------------------------------------
 ### Day 18: Many-Worlds Interpretation
 ### =============================================
-from queue import Queue
+import heapq
+
+import numpy as np
+
+from grid import Grid
 
 # [ Input parsing functions ]
 # ---------------------------
@@ -23,9 +27,14 @@ def parse_input(data):
 
 class Map(object):
     
-    '''Util class to represent the map of entrances, doors and keys.'''
+    '''Util class to represent the map of entrances, doors and keys.
+    
+    The map is stored as NumPy grids (padded with a border of walls) and the
+    points of interest are identified by integer nodes: keys are numbered from
+    0 to 25 and entrances from 26 onwards.'''
     
     KEYS = 'abcdefghijklmnopqrstuvwxyz'
+    ENTRANCE_NODE = len(KEYS) # node id of the first entrance
     
     def __init__(self, data):
         '''initialization function for a new Map.
@@ -36,75 +45,97 @@ class Map(object):
         self.parse_data(data)
             
     def parse_data(self, data):
-        '''Parses the incoming data into a map board and interesting points.
+        '''Parses the incoming data into a map grid and interesting points.
         
         :param data: Provided problem data.
         :type data: str
         '''
-        self.board = {}
-        self.start_positions = []
-        entrance_id = 1
-        for y, line in enumerate(data.split('\n')):
-            for x, char in enumerate(line):
-                if char == '.': # normal path
-                    self.board[(x,y)] = 0
-                elif char == '@': # start pos
-                    self.board[(x,y)] = 0
-                    self.start_positions.append((x, y))
-                    entrance_id += 1
-                elif 65 <= ord(char) <= 90: # door
-                    self.board[(x,y)] = char
-                elif 97 <= ord(char) <= 122: # key
-                    self.board[(x,y)] = char
+        # read the characters as ASCII codes (with a border of walls)
+        self.chars = Grid.from_lines(data.split('\n'), fill=ord('#'), border=1)
+        chars = self.chars.data
+        is_key = (chars >= ord('a')) & (chars <= ord('z'))
+        is_door = (chars >= ord('A')) & (chars <= ord('Z'))
+        is_start = chars == ord('@')
+        # prepare the grids: accessible cells and key bit of each cell (a door
+        # has the bit of the key that opens it)
+        self.grid = is_key | is_door | is_start | (chars == ord('.'))
+        self.bits = np.zeros(chars.shape, dtype=np.int64)
+        self.bits[is_key] = 1 << (chars[is_key].astype(np.int64) - ord('a'))
+        self.bits[is_door] = 1 << (chars[is_door].astype(np.int64) - ord('A'))
+        self.keys_mask = int(np.bitwise_or.reduce(self.bits[is_key]))
+        # get the cell (as a flat index in the grid) of each node
+        self.start_positions = [ self.chars.position(cell) \
+            for cell in np.flatnonzero(is_start) ]
+        n_nodes = Map.ENTRANCE_NODE + len(self.start_positions)
+        self.node_cells = np.full(n_nodes, -1, dtype=np.int64)
+        key_cells = np.flatnonzero(is_key)
+        self.node_cells[chars.ravel()[key_cells] - ord('a')] = key_cells
+        self.node_cells[Map.ENTRANCE_NODE:] = np.flatnonzero(is_start)
 
         self.compute_all_routes()
 
-    def compute_routes(self, source):
-        '''Computes all the routes on the map between a source and all other
-        points of interest (entrances, doors, keys). It uses a BFS approach.
-        
-        :param source: Source of the routes.
-        :type source: tuple(int, int)
-        :return: All relevant routes in the board.
-        :rtype: dict(dict)
-        '''    
-        sx, sy = source
-        visited = set([ (sx, sy) ])
-        queue = Queue()
-        queue.put((source, 0, ''))
-        routes = {}
+    def compute_all_routes(self):
+        '''Computes the routes on the map between all the points of interest
+        (entrances, keys). All the sources are expanded at the same time, in a
+        multi-source BFS where the frontier is stored as NumPy arrays of
+        (source, cell, keys on the way) entries.
         
-        while not queue.empty():
-            (x, y), dist, route = queue.get()
-            data = self.board.get((x, y), None)
-            if data is not None and isinstance(data, str) and dist > 0:
-                routes[data] = (dist, route)
-                route = route + data
-            visited.add((x, y))
-            
-            for dir in [ (1,0), (0,1), (-1,0), (0,-1) ]:
-                neighbor_x, neighbor_y = x + dir[0], y + dir[1]
-                neighbor_data = self.board.get((neighbor_x, neighbor_y), None)
-                if neighbor_data is not None \
-                    and (neighbor_x, neighbor_y) not in visited:
-                    queue.put(((neighbor_x, neighbor_y), dist + 1, route))
-        return routes
+        The result is stored in two (nodes x nodes) matrices: the distances
+        (-1 if unreachable) and the masks of the keys required for each route,
+        i.e. the keys of the doors on the way and the other keys on the way
+        (because a shorter path picks them first).'''
+        n_cells = self.grid.size
+        accessible = self.grid.ravel()
+        bits = self.bits.ravel()
+        offsets = self.chars.flat_offsets()
+        sources = np.flatnonzero(self.node_cells >= 0)
+        # prepare the initial frontier: one entry per source
+        dist = np.full((len(sources), n_cells), -1, dtype=np.int32)
+        masks = np.zeros((len(sources), n_cells), dtype=np.int64)
+        src = np.arange(len(sources))
+        cells = self.node_cells[sources]
+        carry = np.zeros(len(sources), dtype=np.int64)
+        dist[src, cells] = 0
+        step = 0
+        # expand all frontiers until there are no new cells to visit
+        while cells.size > 0:
+            step += 1
+            cand_src = np.repeat(src, len(offsets))
+            cand_cells = (cells[:, None] + offsets).ravel()
+            cand_carry = np.repeat(carry, len(offsets))
+            ok = accessible[cand_cells] & (dist[cand_src, cand_cells] < 0)
+            cand_src = cand_src[ok]
+            cand_cells = cand_cells[ok]
+            # (keep only one entry per (source, cell) pair)
+            _, first = np.unique(cand_src * n_cells + cand_cells,
+                return_index=True)
+            src = cand_src[first]
+            cells = cand_cells[first]
+            carry = cand_carry[ok][first]
+            dist[src, cells] = step
+            masks[src, cells] = carry
+            carry = carry | bits[cells]
+        # extract the routes between nodes
+        n_nodes = len(self.node_cells)
+        self.distances = np.full((n_nodes, n_nodes), -1, dtype=np.int32)
+        self.requirements = np.zeros((n_nodes, n_nodes), dtype=np.int64)
+        self.distances[np.ix_(sources, sources)] = \
+            dist[:, self.node_cells[sources]]
+        self.requirements[np.ix_(sources, sources)] = \
+            masks[:, self.node_cells[sources]]
+        self.compile_routes()
 
-    def compute_all_routes(self):
-        '''Computes all the routes on the map between points of interest
-        (entrances, doors, keys).'''    
-        self.routes = {}
-        # treat start positions (one or many depending on Part I or Part II)
-        if len(self.start_positions) == 1:
-            self.routes['@'] = self.compute_routes(self.start_positions[0])
-        else:
-            for i, pos in enumerate(self.start_positions):
-                self.routes[i+1] = self.compute_routes(pos)
-        # process the rest of the markers
-        for (x, y), marker in self.board.items():
-            if marker == 0:
-                continue
-            self.routes[marker] = self.compute_routes((x, y))
+    def compile_routes(self):
+        '''Compiles the routes from entrances and keys to keys into lists of
+        integers, per node: (target key node, distance, required keys mask).'''
+        self.key_routes = []
+        for node in range(len(self.node_cells)):
+            routes = []
+            for key in range(Map.ENTRANCE_NODE):
+                dist = int(self.distances[node, key])
+                if dist > 0:
+                    routes.append((key, dist, int(self.requirements[node, key])))
+            self.key_routes.append(routes)
 
 ### Part I + II
 def get_number_of_steps(map, n_agents=1):
@@ -113,37 +144,35 @@ def get_number_of_steps(map, n_agents=1):
     
     :param map: Map to process.
     :type map: Map
+    :param n_agents: Number of robots exploring the map at the same time.
+    :type n_agents: int
     :return: Optimal number of steps to get all the keys on the map.
     :rtype: int
     '''
-    keys = set([ k for k in map.routes.keys() \
-        if isinstance(k, str) and k in Map.KEYS ])
-    
-    n = len(keys)
-    # keep current information as dict: (current pos, current keys) -> distance
-    start = ('@',) if n_agents == 1 else tuple([ a+1 for a in range(n_agents) ])
-    cur_info = { (start, frozenset()): 0 }
-    for _ in range(n):
-        new_info = {}
-        for (cur_markers, cur_keys), cur_dist in cur_info.items():
-            for key in keys:
-                if key not in cur_keys:
-                    for agent in range(n_agents):
-                        if key in map.routes[cur_markers[agent]]:
-                            dist, route = map.routes[cur_markers[agent]][key]
-                            reachable = all( (c in cur_keys or c.lower() in cur_keys) \
-                                for c in route )
-                            if reachable:
-                                new_dist = cur_dist + dist
-                                new_keys = frozenset(cur_keys | set((key,)))
-                                new_markers = list(cur_markers)
-                                new_markers[agent] = key
-                                new_markers = tuple(new_markers)
-                                k = (new_markers, new_keys)
-                                if k not in new_info or new_dist < new_info[k]:
-                                    new_info[k] = new_dist
-        cur_info = new_info
-    return min(cur_info.values())
+    all_keys = map.keys_mask
+    # run Dijkstra's algorithm on the (current nodes, current keys) states
+    start = tuple([ Map.ENTRANCE_NODE + a for a in range(n_agents) ])
+    heap = [ (0, start, 0) ]
+    best = { (start, 0): 0 }
+    while heap:
+        cur_dist, cur_nodes, cur_keys = heapq.heappop(heap)
+        if cur_keys == all_keys:
+            return cur_dist
+        if best[(cur_nodes, cur_keys)] < cur_dist:
+            continue
+        for agent, node in enumerate(cur_nodes):
+            for key, dist, required in map.key_routes[node]:
+                bit = 1 << key
+                # (ignore keys that are already collected or unreachable)
+                if cur_keys & bit or required & ~cur_keys:
+                    continue
+                new_dist = cur_dist + dist
+                new_nodes = cur_nodes[:agent] + (key,) + cur_nodes[agent+1:]
+                k = (new_nodes, cur_keys | bit)
+                if k not in best or new_dist < best[k]:
+                    best[k] = new_dist
+                    heapq.heappush(heap, (new_dist, new_nodes, cur_keys | bit))
+    return None
     
 # [ Base tests ]
 # --------------
@@ -184,6 +213,25 @@ def make_tests():
 ###g#h#i################
 ########################''')
     assert get_number_of_steps(map) == 81
+    ### Part II
+    map = parse_input('''#######
+#a.#Cd#
+##@#@##
+#######
+##@#@##
+#cB#Ab#
+#######''')
+    assert get_number_of_steps(map, n_agents=4) == 8
+    map = parse_input('''#############
+#g#f.D#..h#l#
+#F###e#E###.#
+#dCba@#@BcIJ#
+#############
+#nK.L@#@G...#
+#M###N#H###.#
+#o#m..#i#jk.#
+#############''')
+    assert get_number_of_steps(map, n_agents=4) == 72
     
 if __name__ == '__main__':
     # check function results on example cases
@@ -4,6 +4,10 @@
 ### ---------------------------------------------
 ### Day 19: Tractor Beam
 ### =============================================
+from collections import deque
+from fractions import Fraction
+from itertools import count
+
 from tqdm import tqdm
 
 from intcode import IntcodeProgram
@@ -137,7 +141,227 @@ def get_affected_positions(inputs, display=False, debug=False):
     return len(map)
 
 ### Part II
-def find_closest_square(inputs, square_size):
+class BeamScanner(object):
+    
+    '''Util class to scan the tractor beam row by row while only tracking the
+    left and right edges of the beam (rather than storing every affected
+    position). Since the beam is a cone, its edges only move to the right from
+    one row to the next, so following them costs a few probes per row. The
+    scanner also counts the number of probes it has made.
+    
+    The beam is located thanks to an "anchor": any position of the beam
+    outside of the emitter. The line from the emitter through the anchor stays
+    inside of the cone, so if a row contains some positions of the beam, one of
+    the two cells around this line is in the beam (and if none of them is, the
+    row is empty).'''
+    
+    def __init__(self, program, beam_function=None):
+        '''Initialization function for a new BeamScanner.
+        
+        :param program: Program to run to check the positions.
+        :type program: IntcodeProgram
+        :param beam_function: If not None, function that checks if a position
+            (x, y) is within the beam, instead of running the program.
+        :type beam_function: func
+        '''
+        self.program = program
+        self.beam_function = beam_function
+        self.n_probes = 0
+        self._anchor = None
+        
+    def check(self, x, y):
+        '''Checks if a position is within the tractor beam (and counts the
+        probe).
+        
+        :param x: Horizontal coordinate to check.
+        :type x: int
+        :param y: Vertical coordinate to check.
+        :type y: int
+        :return: Whether or not the cell is within the tractor beam.
+        :rtype: bool
+        '''
+        self.n_probes += 1
+        if self.beam_function is not None:
+            return self.beam_function(x, y)
+        return check_coordinates(self.program, x, y)
+        
+    def find_anchor(self):
+        '''Finds a position of the beam outside of the emitter, by checking the
+        cells at a growing distance from the emitter (on the borders of
+        growing squares).
+        
+        :return: Anchor position.
+        :rtype: tuple(int, int)
+        '''
+        if self._anchor is None:
+            for n in count(1):
+                cells = [ (n, y) for y in range(1, n + 1) ] \
+                    + [ (x, n) for x in range(n) ]
+                for x, y in cells:
+                    if self.check(x, y):
+                        self._anchor = (x, y)
+                        return self._anchor
+        return self._anchor
+    
+    def find_inside(self, y):
+        '''Finds a position of the beam in a row, among the two cells around
+        the line from the emitter through the anchor.
+        
+        :param y: Row to search.
+        :type y: int
+        :return: Horizontal coordinate of a position in the beam (or None if
+            the row does not contain any position of the beam).
+        :rtype: int
+        '''
+        ax, ay = self.find_anchor()
+        x = (ax * y) // ay
+        if self.check(x, y):
+            return x
+        if x * ay != ax * y and self.check(x + 1, y):
+            return x + 1
+        return None
+        
+    def scan_rows(self):
+        '''Generator that yields the edges of the beam for each row, starting
+        from the top: the left edge is searched from the left edge of the
+        previous row, and the right edge is extended from the right edge of the
+        previous row (both up to the position found around the anchor line).
+        Near the emitter, some rows may not contain any beam position: their
+        edges are None.
+        
+        :return: Generator of (row, left edge, right edge).
+        :rtype: generator(tuple(int, int, int))
+        '''
+        left, right = 0, 0
+        for y in count():
+            inside = self.find_inside(y)
+            if inside is None:
+                yield y, None, None
+                continue
+            # search for the left edge (from the previous one)
+            while left < inside and not self.check(left, y):
+                left += 1
+            left = min(left, inside)
+            # extend the right edge (from the previous one)
+            right = max(right, inside)
+            while self.check(right + 1, y):
+                right += 1
+            yield y, left, right
+            
+    def find_row_edges(self, y):
+        '''Finds the edges of the beam in any row, with a binary search on each
+        side of the position found around the anchor line.
+        
+        :param y: Row to get the edges of.
+        :type y: int
+        :return: Left and right edges of the beam (or None, None if the row
+            does not contain any position of the beam).
+        :rtype: tuple(int, int)
+        '''
+        inside = self.find_inside(y)
+        if inside is None:
+            return None, None
+        # binary search for the left edge (first position in the beam)
+        lo, hi = -1, inside
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if mid >= 0 and self.check(mid, y):
+                hi = mid
+            else:
+                lo = mid
+        left = hi
+        # galloping and binary search for the right edge (last position in
+        # the beam)
+        step = 1
+        lo = inside
+        while self.check(inside + step, y):
+            lo = inside + step
+            step *= 2
+        hi = inside + step
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if self.check(mid, y):
+                lo = mid
+            else:
+                hi = mid
+        return left, lo
+    
+    def find_square_sliding(self, square_size):
+        '''Finds the closest square of given size that fits in the tractor beam
+        by scanning the rows from the top. The square fits with its bottom-left
+        corner on the left edge of row y if the right edge of row
+        y - square_size + 1 is far enough: only the right edges of the last
+        square_size rows are kept.
+        
+        :param square_size: Size of the edge of the square to find in the grid.
+        :type square_size: int
+        :return: Top-left corner of the square.
+        :rtype: tuple(int, int)
+        '''
+        rights = deque(maxlen=square_size)
+        for y, left, right in self.scan_rows():
+            rights.append(right)
+            if left is None or len(rights) < square_size or rights[0] is None:
+                continue
+            if rights[0] - left + 1 >= square_size:
+                return left, y - square_size + 1
+                
+    def find_square_search(self, square_size):
+        '''Finds the closest square of given size that fits in the tractor beam
+        with a galloping search on the rows (doubling the bottom row of the
+        square until it fits), then a binary search, and finally a walk back to
+        the first row where the square fits.
+        
+        Because the edges of the beam are rounded to integers, whether the
+        square fits or not may flip a few times around the first fitting row,
+        so the binary search only lands near it. The walk back stops when the
+        square misses the beam by more than the rounding errors: the rows
+        above cannot fit either.
+        
+        :param square_size: Size of the edge of the square to find in the grid.
+        :type square_size: int
+        :return: Top-left corner of the square.
+        :rtype: tuple(int, int)
+        '''
+        def margin(y):
+            # (number of extra cells between the left edge of the bottom row
+            # and the right edge of the top row, or None if a row is empty)
+            left, _ = self.find_row_edges(y)
+            _, right = self.find_row_edges(y - square_size + 1)
+            if left is None or right is None:
+                return None, None
+            return left, right - left + 1 - square_size
+        
+        def fits(y):
+            _, m = margin(y)
+            return m is not None and m >= 0
+        
+        # galloping search
+        lo, hi = square_size - 1, square_size
+        while not fits(hi):
+            lo, hi = hi, hi * 2
+        # binary search
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if fits(mid):
+                hi = mid
+            else:
+                lo = mid
+        # walk back to the first fitting row (each edge is off by at most 1
+        # from the line of the cone, so the margin is off by at most 2; the
+        # empty rows near the emitter are skipped)
+        best = hi
+        for y in range(hi - 1, square_size - 2, -1):
+            _, m = margin(y)
+            if m is None:
+                continue
+            if m < -2:
+                break
+            if m >= 0:
+                best = y
+        return margin(best)[0], best - square_size + 1
+
+def find_closest_square(inputs, square_size, method='search'):
     '''Executes the Intcode program on the provided inputs and searches for the
     closet square of given size that fits in the tractor beam. Returns a custom
     checksum for its top-left corner coordinate.
@@ -146,33 +370,66 @@ def find_closest_square(inputs, square_size):
     :type inputs: list(int)
     :param square_size: Size of the edge of the square to find in the grid.
     :type square_size: int
+    :param method: Search method to use: either "sliding" (scan all rows from
+        the top) or "search" (galloping and binary search on the rows).
+    :type method: str
     :return: Top-left corner coordinate checksum.
     :rtype: int
     '''
     # prepare the program instance to read the given inputs as an Intcode
     # program
     program = IntcodeProgram(inputs)
-    # get a large grid to inspect
-    size = 2000
-    map = get_map(program, size)
-
-    # find a square in it... if possible!
-    # (else, retry with a larger size)
-    candidates = set()
-    for position in map:
-        x, y = position
-        if ((x, y + square_size - 1)) in map and \
-            ((x + square_size - 1, y)) in map and \
-            ((x + square_size - 1, y + square_size - 1)) in map:
-            candidates.add((x, y))
-    if len(candidates) > 0:
-        square = sorted(candidates, key=lambda x: x[0] * 10000 + x[1])[0]
+    scanner = BeamScanner(program)
+    if method == 'sliding':
+        x, y = scanner.find_square_sliding(square_size)
     else:
-        return -1
+        x, y = scanner.find_square_search(square_size)
     # compute checksum of square
-    return square[0] * 10000 + square[1]
+    return x * 10000 + y
+    
+# [ Base tests ]
+# --------------
+def make_tests():
+    '''Performs tests on synthetic beams (cones between two slopes, given
+    as fractions) to check the result of the computation functions is ok.'''
+    def cone(min_slope, max_slope):
+        a, b = Fraction(min_slope), Fraction(max_slope)
+        return lambda x, y: a * y <= x <= b * y
+    
+    def brute_force(beam, square_size):
+        # (check all the cells of all the squares that have their top-left
+        # corner in the beam, row by row)
+        for top in count():
+            for x in [ x for x in range(10 * top + 1) if beam(x, top) ]:
+                if all([ beam(x + i, top + j) for i in range(square_size)
+                    for j in range(square_size) ]):
+                    return x, top
+    
+    ### PART II
+    for min_slope, max_slope, square_size in [
+        ('7.6', '8.41', 2), ('7.6', '8.41', 5), # steep beams
+        ('1.357', '6.52', 2), ('1.03', '4.43', 2), # near the emitter
+        ('0.3', '0.3286', 2), ('0.222', '0.2567', 2), # narrow beams
+        ('2.0', '2.03125', 2), ('1.043', '1.065', 2),
+        ('0.5', '0.6', 1), ('0.5', '0.6', 3), ('0.5', '0.6', 7),
+    ]:
+        beam = cone(min_slope, max_slope)
+        corner = brute_force(beam, square_size)
+        assert BeamScanner(None, beam).find_square_sliding(square_size) == corner
+        assert BeamScanner(None, beam).find_square_search(square_size) == corner
+    # (the sliding method follows the edges with a few probes per row, and the
+    # search only probes a few rows)
+    beam = cone('0.7', '0.78')
+    sliding, search = BeamScanner(None, beam), BeamScanner(None, beam)
+    x, y = sliding.find_square_sliding(100)
+    assert search.find_square_search(100) == (x, y)
+    assert sliding.n_probes <= 5 * (y + 100)
+    assert search.n_probes <= sliding.n_probes // 4
     
 if __name__ == '__main__':
+    # check function results on example cases
+    make_tests()
+    
     # get input data
     data_path = '../data/day19.txt'
     inputs = parse_input(open(data_path, 'r').read())
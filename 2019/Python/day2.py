@@ -4,7 +4,10 @@
 ### ---------------------------------------------
 ### Day 2: 1202 Program Alarm
 ### =============================================
-from intcode import IntcodeProgram
+from concurrent.futures import ProcessPoolExecutor
+
+from intcode import IntcodeProgram, SymbolicIntcodeProgram, SymbolicValue, \
+    UnknownValue, SymbolicExecutionError
 
 # [ Input parsing functions ]
 # ---------------------------
@@ -43,23 +46,24 @@ def process_inputs(inputs, restore_gravity_assist=False):
     return program.program[0]
     
 ### PART II
-def find_pair(inputs, wanted_output):
+def search_nouns(inputs, nouns, wanted_output):
     '''A brute-force algorithm to systematically try all possible input pairs
-    until we find the one that gave the desired output (we can determine a
-    finished set of possible candidates since we know that each number is in the
-    [0, 99] range).
+    for the given nouns until we find the one that gave the desired output.
     
     :param inputs: List of integers to execute as an Intcode program.
     :type inputs: list(int)
+    :param nouns: Nouns to try (with all verbs in the [0, 99] range).
+    :type nouns: list(int)
     :param wanted_output: Desired output of the program.
     :type wanted_output: int
-    :return: Specific checksum that matches the desired output.
+    :return: Specific checksum that matches the desired output (or None if
+        there is none).
     :rtype: int
     '''
     # prepare program
     program = IntcodeProgram(inputs)
-    for noun in range(0, 100): # range is [0, 100[ = [0, 99]
-        for verb in range(0, 100):
+    for noun in nouns:
+        for verb in range(0, 100): # range is [0, 100[ = [0, 99]
             # reset program to initial state
             program.reset()
             # set up noun and verb
@@ -69,6 +73,95 @@ def find_pair(inputs, wanted_output):
             program.run()
             if program.program[0] == wanted_output:
                 return 100 * noun + verb
+    return None
+
+def find_pair_brute_force(inputs, wanted_output, n_workers=4):
+    '''Sweeps all possible input pairs (we can determine a finished set of
+    possible candidates since we know that each number is in the [0, 99]
+    range). The nouns are split between worker processes that each try all
+    verbs, and the first pair in the usual noun/verb order is kept.
+    
+    :param inputs: List of integers to execute as an Intcode program.
+    :type inputs: list(int)
+    :param wanted_output: Desired output of the program.
+    :type wanted_output: int
+    :param n_workers: Number of worker processes (if 1, the sweep is done in
+        the current process).
+    :type n_workers: int
+    :return: Specific checksum that matches the desired output.
+    :rtype: int
+    '''
+    if n_workers == 1:
+        return search_nouns(inputs, range(0, 100), wanted_output)
+    chunks = [ range(w * 100 // n_workers, (w + 1) * 100 // n_workers)
+        for w in range(n_workers) ]
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        results = executor.map(search_nouns, [ inputs ] * n_workers, chunks,
+            [ wanted_output ] * n_workers)
+        for result in results:
+            if result is not None:
+                return result
+    return None
+
+def compute_symbolic_output(inputs):
+    '''Runs the Intcode program once with the noun and the verb as symbols to
+    get the final output as a polynomial of the noun and the verb.
+    
+    :param inputs: List of integers to execute as an Intcode program.
+    :type inputs: list(int)
+    :return: Final output of the program (or None if it depends on the noun
+        and the verb in a way that cannot be expressed as a polynomial, e.g.
+        because of a jump).
+    :rtype: SymbolicValue or int
+    '''
+    program = SymbolicIntcodeProgram(inputs)
+    program.program[1], program.program[2] = SymbolicValue.symbols(2)
+    try:
+        program.run()
+    except SymbolicExecutionError:
+        return None
+    if isinstance(program.program[0], UnknownValue):
+        return None
+    return program.program[0]
+
+def find_pair(inputs, wanted_output):
+    '''Finds the input pair that gives the desired output. The program is
+    first run symbolically: if the output is a polynomial of the noun and the
+    verb, then for each noun we solve directly for the verb (if the polynomial
+    is linear in the verb, which is the case for linear or bilinear outputs) or
+    evaluate the polynomial for all verbs. Otherwise, we fall back to a
+    brute-force sweep of all pairs.
+    
+    :param inputs: List of integers to execute as an Intcode program.
+    :type inputs: list(int)
+    :param wanted_output: Desired output of the program.
+    :type wanted_output: int
+    :return: Specific checksum that matches the desired output.
+    :rtype: int
+    '''
+    output = compute_symbolic_output(inputs)
+    if output is None:
+        return find_pair_brute_force(inputs, wanted_output)
+    if not isinstance(output, SymbolicValue):
+        return 0 if output == wanted_output else None
+    for noun in range(0, 100):
+        poly = output.substitute(0, noun)
+        if not isinstance(poly, SymbolicValue):
+            if poly == wanted_output:
+                return 100 * noun
+            continue
+        if max(e[1] for e in poly.terms) == 1:
+            # solve: a + b * verb = wanted_output
+            a = poly.terms.get((0, 0), 0)
+            b = poly.terms[(0, 1)]
+            verb, r = divmod(wanted_output - a, b)
+            if r == 0 and 0 <= verb < 100:
+                return 100 * noun + verb
+        else:
+            for verb in range(0, 100):
+                if poly.evaluate((noun, verb)) == wanted_output:
+                    return 100 * noun + verb
+    return None
 
 # [ Base tests ]
 # --------------
@@ -81,6 +174,18 @@ def make_tests():
     assert process_inputs([ 2,3,0,3,99 ]) == 2
     assert process_inputs([ 2,4,4,5,99,0 ]) == 2
     assert process_inputs([ 1,1,1,4,99,5,6,0,99 ]) == 30
+    
+    ### PART II
+    # (bilinear output: 3 + noun * verb)
+    program = [ 1,0,0,0,2,1,2,0,1,0,13,0,99,3 ]
+    assert compute_symbolic_output(program).terms == { (0, 0): 3, (1, 1): 1 }
+    assert find_pair(program, 4260) == 4399
+    assert find_pair_brute_force(program, 4260, n_workers=1) == 4399
+    # (data-dependent jump: falls back to the brute-force sweep)
+    program = [ 1,0,0,17,1005,1,12,1101,7,0,0,99,1,1,2,0,99,0 ]
+    assert compute_symbolic_output(program) is None
+    assert find_pair(program, 150) == 5199
+    assert find_pair(program, 7) == 0
 
 if __name__ == '__main__':
     # check function results on example cases
@@ -4,6 +4,8 @@
 ### ---------------------------------------------
 ### Day 3: Crossed Wires
 ### =============================================
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
 
 # [ Input parsing functions ]
 # ---------------------------
@@ -35,41 +37,219 @@ def manhattan_distance(x1, y1, x2, y2):
     '''
     return abs(x2 - x1) + abs(y2 - y1)
     
-def find_path_points(path):
-    '''Computes all the points a path goes through.
+def find_path_segments(path):
+    '''Computes the horizontal and vertical segments of a path. Each segment
+    is stored with its fixed coordinate, the coordinates of its start and of
+    its end on the other axis, and the number of steps taken to reach its
+    start (so the number of steps to reach any point on the segment is the
+    start steps plus the distance from the start).
     
     :param path: Path to walk, as a list of moves to take (with a direction and
         an integer pace).
     :type path: list(str)
-    :return: Points on the path.
-    :type: dict(tuple(int, int), int)
+    :return: Horizontal segments (y, x_start, x_end, steps) and vertical
+        segments (x, y_start, y_end, steps) of the path.
+    :type: list(tuple(int, int, int, int)), list(tuple(int, int, int, int))
     '''
-    cx = 0; cy = 0; d = 1
-    points = {}
+    cx = 0; cy = 0; d = 0
+    horizontals, verticals = [], []
     for move in path:
         dir = move[0]
         pace = int(move[1:])
         if dir == 'R':
-            for x in range(cx + 1, cx + pace + 1):
-                points[(x,cy)] = d
-                d += 1
+            horizontals.append((cy, cx, cx + pace, d))
             cx += pace
         elif dir == 'L':
-            for x in range(cx - 1, cx - pace - 1, -1):
-                points[(x,cy)] = d
-                d += 1
+            horizontals.append((cy, cx, cx - pace, d))
             cx -= pace
         elif dir == 'U':
-            for y in range(cy - 1, cy - pace - 1, -1):
-                points[(cx,y)] = d
-                d += 1
+            verticals.append((cx, cy, cy - pace, d))
             cy -= pace
         elif dir == 'D':
-            for y in range(cy + 1, cy + pace + 1):
-                points[(cx,y)] = d
-                d += 1
+            verticals.append((cx, cy, cy + pace, d))
             cy += pace
-    return points
+        d += pace
+    return horizontals, verticals
+
+class ActiveSegments(object):
+    
+    '''Util class to store the horizontal segments that are currently crossed
+    by the sweep line, grouped by their y coordinate. All the possible y
+    coordinates are known in advance, so they are sorted once and a Fenwick
+    tree (or binary indexed tree) counts the active segments up to each of
+    them: adding or removing a segment and finding the next y coordinate that
+    has active segments both take a logarithmic time.'''
+    
+    def __init__(self, keys):
+        '''Initialization function for a new ActiveSegments.
+        
+        :param keys: All the y coordinates that segments can have.
+        :type keys: iterable(int)
+        '''
+        self.keys = sorted(set(keys))
+        self.slots = { k: i for i, k in enumerate(self.keys) }
+        self.buckets = [ set() for _ in self.keys ]
+        self.tree = [ 0 ] * (len(self.keys) + 1)
+        self.top_bit = 1 << len(self.keys).bit_length()
+        
+    def _update(self, slot, delta):
+        slot += 1
+        while slot < len(self.tree):
+            self.tree[slot] += delta
+            slot += slot & -slot
+            
+    def _count_before(self, slot):
+        # (number of active segments in the slots before the given one)
+        total = 0
+        while slot > 0:
+            total += self.tree[slot]
+            slot -= slot & -slot
+        return total
+    
+    def _find_slot(self, rank):
+        # (slot that contains the active segment of given rank, starting from
+        # 0, found by descending the tree)
+        slot, bit = 0, self.top_bit
+        while bit:
+            if slot + bit < len(self.tree) and self.tree[slot + bit] <= rank:
+                slot += bit
+                rank -= self.tree[slot]
+            bit >>= 1
+        return slot
+    
+    def add(self, key, item):
+        '''Adds a segment to the active ones.
+        
+        :param key: Y coordinate of the segment.
+        :type key: int
+        :param item: Index of the segment.
+        :type item: int
+        '''
+        slot = self.slots[key]
+        self.buckets[slot].add(item)
+        self._update(slot, 1)
+        
+    def remove(self, key, item):
+        '''Removes a segment from the active ones.
+        
+        :param key: Y coordinate of the segment.
+        :type key: int
+        :param item: Index of the segment.
+        :type item: int
+        '''
+        slot = self.slots[key]
+        self.buckets[slot].remove(item)
+        self._update(slot, -1)
+        
+    def find_between(self, lo, hi):
+        '''Generator that yields the active segments with a y coordinate in a
+        given range, by jumping from one non-empty slot to the next.
+        
+        :param lo: Minimum y coordinate.
+        :type lo: int
+        :param hi: Maximum y coordinate.
+        :type hi: int
+        :return: Generator of (y coordinate, segment index).
+        :rtype: generator(tuple(int, int))
+        '''
+        end = bisect_right(self.keys, hi)
+        rank = self._count_before(bisect_left(self.keys, lo))
+        while True:
+            slot = self._find_slot(rank)
+            if slot >= end:
+                return
+            for item in self.buckets[slot]:
+                yield self.keys[slot], item
+            rank += len(self.buckets[slot])
+
+def find_crossings(horizontals, verticals):
+    '''Finds the crossings between horizontal segments of a path and vertical
+    segments of another one with a sweep line: the line moves along the x
+    axis and keeps the horizontal segments that are currently crossed indexed
+    by y, so that each vertical segment only has to visit the active
+    horizontal segments in its y range. With n segments and k crossings, this
+    takes O((n + k) log n) time and O(n) memory.
+    
+    :param horizontals: Horizontal segments of the first path.
+    :type horizontals: list(tuple(int, int, int, int))
+    :param verticals: Vertical segments of the second path.
+    :type verticals: list(tuple(int, int, int, int))
+    :return: Crossings with the number of steps to reach them on each path.
+    :rtype: list(tuple(int, int, int, int))
+    '''
+    # prepare the events (at the same x: add, then query, then remove)
+    events = []
+    for i, (y, x1, x2, _) in enumerate(horizontals):
+        events.append((min(x1, x2), 0, i))
+        events.append((max(x1, x2), 2, i))
+    for i, (x, _, _, _) in enumerate(verticals):
+        events.append((x, 1, i))
+    events.sort()
+    # sweep the line
+    crossings = []
+    active = ActiveSegments([ h[0] for h in horizontals ])
+    for x, kind, i in events:
+        if kind == 0:
+            active.add(horizontals[i][0], i)
+        elif kind == 2:
+            active.remove(horizontals[i][0], i)
+        else:
+            _, y1, y2, steps_v = verticals[i]
+            for y, j in active.find_between(min(y1, y2), max(y1, y2)):
+                _, x_start, _, steps_h = horizontals[j]
+                crossings.append((x, y, steps_h + abs(x - x_start),
+                    steps_v + abs(y - y1)))
+    return crossings
+
+def find_overlaps(segments1, segments2):
+    '''Finds the overlaps between parallel segments of two paths that are on
+    the same line. Since the number of steps is linear on an overlap, only its
+    ends and its closest points to the central port are kept as crossings.
+    
+    :param segments1: Segments of the first path (all horizontal or all
+        vertical).
+    :type segments1: list(tuple(int, int, int, int))
+    :param segments2: Segments of the second path (in the same direction).
+    :type segments2: list(tuple(int, int, int, int))
+    :return: Crossings (as (fixed coordinate, other coordinate)) with the
+        number of steps to reach them on each path.
+    :rtype: list(tuple(int, int, int, int))
+    '''
+    lines = defaultdict(list)
+    for segment in segments2:
+        lines[segment[0]].append(segment)
+    crossings = []
+    for c, a1, a2, steps1 in segments1:
+        for _, b1, b2, steps2 in lines.get(c, []):
+            lo = max(min(a1, a2), min(b1, b2))
+            hi = min(max(a1, a2), max(b1, b2))
+            if lo > hi:
+                continue
+            # (the points next to the central port are kept as well, in case
+            # the overlap contains it)
+            candidates = [ lo, hi ] + [ min(max(p, lo), hi) for p in (-1, 0, 1) ]
+            for p in set(candidates):
+                crossings.append((c, p, steps1 + abs(p - a1),
+                    steps2 + abs(p - b1)))
+    return crossings
+
+def find_intersections(paths):
+    '''Finds all the intersections of two paths (except the central port),
+    with the number of steps to reach them on each path.
+    
+    :param paths: Paths to process.
+    :type paths: list(list(str))
+    :return: Intersections (x, y, steps on first path, steps on second path).
+    :rtype: list(tuple(int, int, int, int))
+    '''
+    (h1, v1), (h2, v2) = [ find_path_segments(path) for path in paths ]
+    intersections = find_crossings(h1, v2)
+    intersections += [ (x, y, s1, s2) for x, y, s2, s1 \
+        in find_crossings(h2, v1) ]
+    intersections += [ (x, y, s1, s2) for y, x, s1, s2 \
+        in find_overlaps(h1, h2) ]
+    intersections += find_overlaps(v1, v2)
+    return [ i for i in intersections if i[0] != 0 or i[1] != 0 ]
 
 ### PART I
 def find_closest_intersection_with_dist(paths):
@@ -81,12 +261,10 @@ def find_closest_intersection_with_dist(paths):
     :return: Distance to the closest intersection to the central port.
     :rtype: int
     '''
-    # compute all activated points on the grid
-    path_points = [ find_path_points(path) for path in paths ]
     # extract the intersections of all the paths
-    intersections = set(path_points[0]).intersection(set(path_points[1]))
+    intersections = find_intersections(paths)
     # find the one closest to the central port (compute its Manhattan distance)
-    dists = [ manhattan_distance(pos[0], pos[1], 0, 0) for pos in intersections ]
+    dists = [ manhattan_distance(x, y, 0, 0) for x, y, _, _ in intersections ]
     return min(dists)
 
 ### PART II
@@ -99,12 +277,10 @@ def find_closest_intersection_with_steps(paths):
     :return: Distance to the closest intersection to the central port.
     :rtype: int
     '''
-    # compute all activated points on the grid
-    path_points = [ find_path_points(path) for path in paths ]
     # extract the intersections of all the paths
-    intersections = set(path_points[0]).intersection(set(path_points[1]))
+    intersections = find_intersections(paths)
     # find the smallest sum of combined steps
-    return min([ sum([ p[i] for p in path_points ]) for i in intersections ])
+    return min([ s1 + s2 for _, _, s1, s2 in intersections ])
 
 # [ Base tests ]
 # --------------
@@ -138,6 +314,25 @@ def make_tests():
         ['R98','U47','R26','D63','R33','U87','L62','D20','R33','U53','R51'],
         ['U98','R91','D20','R16','D67','R40','U7','R15','U6','R7']
     ]) == 410
+    # (overlapping parallel segments)
+    assert find_closest_intersection_with_dist([
+        ['R10','U5'],
+        ['U2','R3','D2','R4']
+    ]) == 3
+    assert find_closest_intersection_with_steps([
+        ['R10','U5'],
+        ['U2','R3','D2','R4']
+    ]) == 10
+    
+    ### Sweep line
+    active = ActiveSegments([ 5, -3, 8, 5, 0 ])
+    for key, item in [ (5, 0), (-3, 1), (8, 2), (5, 3) ]:
+        active.add(key, item)
+    active.remove(8, 2)
+    assert sorted(active.find_between(-3, 5)) == [ (-3, 1), (5, 0), (5, 3) ]
+    assert sorted(active.find_between(-10, 20)) == [ (-3, 1), (5, 0), (5, 3) ]
+    assert list(active.find_between(0, 4)) == []
+    assert list(active.find_between(6, 10)) == []
 
 if __name__ == '__main__':
     # check function results on example cases
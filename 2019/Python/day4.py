@@ -5,6 +5,8 @@
 ### Day 4: Secure Container
 ### =============================================
 from collections import Counter
+from functools import lru_cache
+from itertools import combinations_with_replacement, groupby
 
 # [ Input parsing functions ]
 # ---------------------------
@@ -72,24 +74,163 @@ def number_is_ok_p2(number):
     counts = Counter(list(n_str))
     return 2 in counts.values()
 
-def get_count_of_valid_numbers(inputs, check):
-    '''Finds all the valid numbers (that meet the given password criteria) in
-    the range given by the inputs.
-        
+def groups_are_ok(digits, exact_double):
+    '''Checks if a non-decreasing sequence of digits has a valid group of
+    matching digits: for Part I, any group of at least two digits; for Part II,
+    a group of exactly two digits.
+
+    :param digits: Non-decreasing digits to check.
+    :type digits: tuple(int)
+    :param exact_double: Whether the group has to be an exact double (Part II).
+    :type exact_double: bool
+    :return: Groups validity.
+    :rtype: bool
+    '''
+    sizes = [ len(list(g)) for _, g in groupby(digits) ]
+    if exact_double:
+        return 2 in sizes
+    return max(sizes) >= 2
+
+def iter_valid_numbers(inputs, exact_double, length=6):
+    '''Generates the valid numbers in the range given by the inputs by only
+    enumerating the non-decreasing sequences of digits (rather than all the
+    integers of the range). Since the first digit cannot be 0 and the digits
+    never decrease, these are the combinations with replacement of the digits
+    from 1 to 9, produced in increasing order.
+
     :param inputs: Minimum and maximum value (inclusive) for the numbers to check.
     :type inputs: list(int)
-    :param check: Validity function to pass.
-    :type check: func
-    :return: Count of numbers in the range that pass the test.
-    :rtype: int
+    :param exact_double: Whether the group has to be an exact double (Part II).
+    :type exact_double: bool
+    :param length: Number of digits of the passwords.
+    :type length: int
+    :return: Generator of the valid numbers, in increasing order.
+    :rtype: generator(int)
     '''
     min, max = inputs
+    for digits in combinations_with_replacement(range(1, 10), length):
+        number = int(''.join(map(str, digits)))
+        if number < min:
+            continue
+        if number > max:
+            break
+        if groups_are_ok(digits, exact_double):
+            yield number
+
+@lru_cache(maxsize=None)
+def count_suffixes(remaining, last, run, ok, exact_double):
+    '''Counts the ways to complete a non-decreasing sequence of digits so
+    that it has a valid group (digit DP without any upper bound).
+
+    :param remaining: Number of digits left to choose.
+    :type remaining: int
+    :param last: Last digit of the current sequence.
+    :type last: int
+    :param run: Size of the current group of matching digits (capped to 3).
+    :type run: int
+    :param ok: Whether a closed group already meets the criteria.
+    :type ok: bool
+    :param exact_double: Whether the group has to be an exact double (Part II).
+    :type exact_double: bool
+    :return: Number of valid completions.
+    :rtype: int
+    '''
+    if remaining == 0:
+        return int(ok or run_is_ok(run, exact_double))
     count = 0
-    for n in range(min, max+1):
-        if check(n):
-            count += 1
+    for d in range(last, 10):
+        count += count_suffixes(remaining - 1, d,
+            *next_state(last, run, ok, d, exact_double), exact_double)
     return count
 
+def run_is_ok(run, exact_double):
+    '''Checks if a closed group of matching digits meets the criteria.
+
+    :param run: Size of the group (capped to 3).
+    :type run: int
+    :param exact_double: Whether the group has to be an exact double (Part II).
+    :type exact_double: bool
+    :return: Group validity.
+    :rtype: bool
+    '''
+    return run == 2 if exact_double else run >= 2
+
+def next_state(last, run, ok, digit, exact_double):
+    '''Gets the DP state after appending a digit to the sequence.
+
+    :param last: Last digit of the current sequence.
+    :type last: int
+    :param run: Size of the current group of matching digits (capped to 3).
+    :type run: int
+    :param ok: Whether a closed group already meets the criteria.
+    :type ok: bool
+    :param digit: Digit to append (it must not be lower than the last one).
+    :type digit: int
+    :param exact_double: Whether the group has to be an exact double (Part II).
+    :type exact_double: bool
+    :return: New group size and validity flag.
+    :rtype: tuple(int, bool)
+    '''
+    if digit == last:
+        return min(run + 1, 3), ok
+    return 1, ok or run_is_ok(run, exact_double)
+
+def count_valid_numbers_up_to(bound, exact_double, length=6):
+    '''Counts the valid numbers of the given length that are lower or equal
+    to a bound, without enumerating them: the digits of the bound are walked
+    from left to right and, at each position, all the sequences that take a
+    lower digit are counted at once with the digit DP.
+
+    :param bound: Maximum value (inclusive) for the numbers.
+    :type bound: int
+    :param exact_double: Whether the group has to be an exact double (Part II).
+    :type exact_double: bool
+    :param length: Number of digits of the passwords.
+    :type length: int
+    :return: Count of valid numbers.
+    :rtype: int
+    '''
+    if bound < 10 ** (length - 1):
+        return 0
+    bound = min(bound, 10 ** length - 1)
+    digits = [ int(c) for c in str(bound) ]
+    count = 0
+    # the first digit is "appended" to a virtual 0-sized group of digit 1 so
+    # that it cannot be 0 and never closes a group
+    last, run, ok = 1, 0, False
+    for i, digit in enumerate(digits):
+        for d in range(last, digit):
+            count += count_suffixes(length - i - 1, d,
+                *next_state(last, run, ok, d, exact_double), exact_double)
+        if digit < last:
+            return count
+        run, ok = next_state(last, run, ok, digit, exact_double)
+        last = digit
+    return count + int(ok or run_is_ok(run, exact_double))
+
+def get_count_of_valid_numbers(inputs, exact_double, length=6, method='dp'):
+    '''Counts all the valid numbers (that meet the password criteria) in the
+    range given by the inputs. With the "dp" method, the numbers are counted
+    directly with a digit DP against the range bounds; with the "enumerate"
+    method, only the non-decreasing sequences of digits are generated.
+
+    :param inputs: Minimum and maximum value (inclusive) for the numbers to check.
+    :type inputs: list(int)
+    :param exact_double: Whether the group has to be an exact double (Part II).
+    :type exact_double: bool
+    :param length: Number of digits of the passwords.
+    :type length: int
+    :param method: Counting method (either "dp" or "enumerate").
+    :type method: str
+    :return: Count of numbers in the range that pass the test.
+    :rtype: int
+    '''
+    if method == 'enumerate':
+        return sum(1 for _ in iter_valid_numbers(inputs, exact_double, length))
+    min, max = inputs
+    return count_valid_numbers_up_to(max, exact_double, length) \
+        - count_valid_numbers_up_to(min - 1, exact_double, length)
+
 # [ Base tests ]
 # --------------
 def make_tests():
@@ -104,6 +245,22 @@ def make_tests():
     assert number_is_ok_p2(112233) == True
     assert number_is_ok_p2(123444) == False
     assert number_is_ok_p2(111122) == True
+    
+    ### Counting methods
+    for inputs in [ (100000, 999999), (248345, 746315), (111122, 111122),
+        (123444, 223450) ]:
+        for check, exact_double in [ (number_is_ok_p1, False),
+            (number_is_ok_p2, True) ]:
+            expected = sum(1 for n in range(inputs[0], inputs[1] + 1) if check(n)) \
+                if inputs[1] - inputs[0] < 200000 else None
+            dp = get_count_of_valid_numbers(inputs, exact_double)
+            en = get_count_of_valid_numbers(inputs, exact_double, method='enumerate')
+            assert dp == en
+            assert expected is None or dp == expected
+    for exact_double in [ False, True ]:
+        assert get_count_of_valid_numbers((1234567890, 8765432100), exact_double,
+            length=10) == get_count_of_valid_numbers((1234567890, 8765432100),
+            exact_double, length=10, method='enumerate')
 
 if __name__ == '__main__':
     # check function results on example cases
@@ -114,10 +271,10 @@ if __name__ == '__main__':
     inputs = parse_input(data)
 
     ### PART I
-    solution = get_count_of_valid_numbers(inputs, number_is_ok_p1)
+    solution = get_count_of_valid_numbers(inputs, False)
     print('PART I: solution = {}'.format(solution))
 
     ### PART II
-    solution = get_count_of_valid_numbers(inputs, number_is_ok_p2)
+    solution = get_count_of_valid_numbers(inputs, True)
     print('PART II: solution = {}'.format(solution))
     
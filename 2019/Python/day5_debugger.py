@@ -5,7 +5,7 @@
 ### Day 5: Sunny with a Chance of Asteroids
 ### (Debugger version)
 ### =============================================
-import io, sys
+from intcode import IntcodeCore, STEP_OK, STEP_OUTPUT
 
 # [ Input parsing functions ]
 # ---------------------------
@@ -21,172 +21,167 @@ def parse_input(data):
 
 # [ Util class ]
 # --------------
-STREAM = None
+class DebugEvent(object):
+    
+    '''Util class to represent something that happened during a debug session
+    (an output, a breakpoint or watchpoint hit, a halt...).'''
+    
+    __slots__ = ('kind', 'ip', 'address', 'value')
+    
+    def __init__(self, kind, ip, address=None, value=None):
+        '''Initialization function for a new DebugEvent.
+        
+        :param kind: Type of event ("output", "breakpoint", "watchpoint",
+            "input", "halt" or "error").
+        :type kind: str
+        :param ip: Instruction pointer at the time of the event.
+        :type ip: int
+        :param address: Address concerned by the event (for watchpoints).
+        :type address: int
+        :param value: Value concerned by the event (output or written value).
+        :type value: int
+        '''
+        self.kind = kind
+        self.ip = ip
+        self.address = address
+        self.value = value
+        
+    def __repr__(self):
+        return 'DebugEvent({}, ip={}, address={}, value={})'.format(
+            self.kind, self.ip, self.address, self.value)
+
 class Debugger(object):
     
-    '''Util class to print the Intcode program output to a specific stream and
-    get back the result easily from it at the end of the execution.'''
+    '''Util class to run an Intcode program step by step on the shared
+    low-overhead core and record what happens as a list of structured events
+    (rather than capturing printed text). Breakpoints (instruction addresses)
+    and watchpoints (written memory addresses) are sets, so checking them costs
+    one lookup per step.'''
     
-    def __init__(self):
-        self.stream = io.StringIO()
-        global STREAM
-        STREAM = self.stream
+    def __init__(self, program, inputs=None, breakpoints=None, watchpoints=None):
+        '''Initialization function for a new Debugger.
+        
+        :param program: Intcode program to debug.
+        :type program: list(int)
+        :param inputs: Initial inputs of the program.
+        :type inputs: list(int)
+        :param breakpoints: Instruction addresses to pause at (before the
+            instruction is executed).
+        :type breakpoints: set(int)
+        :param watchpoints: Memory addresses to pause at when they are written.
+        :type watchpoints: set(int)
+        '''
+        self.core = IntcodeCore(program, inputs)
+        self.breakpoints = set(breakpoints or [])
+        self.watchpoints = set(watchpoints or [])
+        self.events = []
         
     def __enter__(self):
         return self
         
     def __exit__(self, type, value, traceback):
-        self.stream.close()
-        global STREAM
-        STREAM = None
+        self.events = []
+        
+    def run(self):
+        '''Runs (or resumes) the program until it halts, errors, needs an
+        input or hits a breakpoint or a watchpoint.
+        
+        :return: Last recorded event.
+        :rtype: DebugEvent
+        '''
+        core, events = self.core, self.events
+        breakpoints, watchpoints = self.breakpoints, self.watchpoints
+        step = core.step
+        # (do not stop again on the breakpoint we are resuming from)
+        resuming = len(events) > 0 and events[-1].kind == 'breakpoint'
+        while True:
+            ip = core.ip
+            if ip in breakpoints and not resuming:
+                events.append(DebugEvent('breakpoint', ip))
+                return events[-1]
+            resuming = False
+            status = step()
+            if status == STEP_OUTPUT:
+                events.append(DebugEvent('output', ip, value=core.outputs[-1]))
+            elif status != STEP_OK:
+                events.append(DebugEvent(status, ip))
+                return events[-1]
+            address = core.last_write
+            if address is not None and address in watchpoints:
+                events.append(DebugEvent('watchpoint', ip, address,
+                    core.memory[address]))
+                return events[-1]
+            
+    def outputs(self):
+        '''Gets all the values that were output by the program so far.
         
-    def full_output(self):
-        return self.stream.getvalue()
+        :return: Outputs of the program.
+        :rtype: list(int)
+        '''
+        return [ e.value for e in self.events if e.kind == 'output' ]
         
-    def last_output(self, separator='\n'):
-        output = self.full_output()
-        contents = [ c for c in output.split(separator) if len(c) > 0 ]
-        return contents[-1]
+    def last_output(self):
+        '''Gets the last value that was output by the program.
+        
+        :return: Last output of the program (or None if there was none).
+        :rtype: int
+        '''
+        for event in reversed(self.events):
+            if event.kind == 'output':
+                return event.value
+        return None
 
 # [ Computation functions ]
 # -------------------------
-INPUT = None # specific value for the input instruction
-OPERATIONS = {
-    1: (lambda a, b: a + b, 3),
-    2: (lambda a, b: a * b, 3),
-    3: (lambda: INPUT, 1),
-    4: (None, 1),
-    5: (None, 2),
-    6: (None, 2),
-    7: (lambda a, b: a < b, 3),
-    8: (lambda a, b: a == b, 3)
-}
-
-def get_value(inputs, data, mode):
-    '''Gets the "address" or "immediate value" for a given set of inputs and
-    data.
-    
-    :param inputs: List of integers to execute as an Intcode program.
-    :type inputs: list(int)
-    :param data: Data to execute.
-    :type data: int
-    :param mode: Execution mode (either 0, "address mode"; or 1, "immediate
-        value mode").
-    :type mode: int
-    :return: Data value.
-    :rtype: int
-    '''
-    return inputs[data] if mode == 0 else data
-
-def process_opcode(inputs, instruction_ptr):
-    '''Process an opcode by using the provided inputs and the current operation
-    index.
-    
-    :param inputs: List of integers to execute as an Intcode program.
-    :type inputs: list(int)
-    :param instruction_ptr: Current instruction pointer.
-    :type instruction_ptr: int
-    :return: Updated instruction pointer.
-    :rtype: int
-    '''
-    instruction = str(inputs[instruction_ptr])
-    code = int(instruction[-2:])
-    if code == 99:
-        return None
-
-    op, n_inputs = OPERATIONS[code]
-    modes = instruction[:-2]
-    op_modes = [ int(m) for m in modes[::-1] ] + [ 0 ] * (n_inputs - len(modes))
-    
-    if code == 1 or code == 2: # add or multiply
-        a, b, c = inputs[instruction_ptr+1:instruction_ptr+n_inputs+1]
-        inputs[c] = op(
-            get_value(inputs, a, op_modes[0]), get_value(inputs, b, op_modes[1])
-        )
-        return instruction_ptr + n_inputs + 1
-    elif code == 3: # read input
-        a = inputs[instruction_ptr+1]
-        inputs[a] = op()
-        return instruction_ptr + n_inputs + 1
-    elif code == 4: # print output
-        a = inputs[instruction_ptr+1]
-        v = get_value(inputs, a, op_modes[0])
-        if STREAM is None:
-            print(v)
-        else:
-            STREAM.write('{}\n'.format(v))
-        return instruction_ptr + n_inputs + 1
-    elif code == 5: # jump-true
-        a, b = inputs[instruction_ptr+1:instruction_ptr+n_inputs+1]
-        if get_value(inputs, a, op_modes[0]) != 0:
-            return get_value(inputs, b, op_modes[1])
-        else:
-            return instruction_ptr + n_inputs + 1
-    elif code == 6: # jump-false
-        a, b = inputs[instruction_ptr+1:instruction_ptr+n_inputs+1]
-        if get_value(inputs, a, op_modes[0]) == 0:
-            return get_value(inputs, b, op_modes[1])
-        else:
-            return instruction_ptr + n_inputs + 1
-    elif code == 7 or code == 8: # less than or equal
-        a, b, c = inputs[instruction_ptr+1:instruction_ptr+n_inputs+1]
-        if op(get_value(inputs, a, op_modes[0]), get_value(inputs, b, op_modes[1])):
-            inputs[c] = 1
-        else:
-            inputs[c] = 0
-        return instruction_ptr + n_inputs + 1
-    else:
-        return -1
-
-def process_inputs(inputs):
+def process_inputs(inputs, input):
     '''Executes the Intcode program on the provided inputs and computes the final
     result.
     
     :param inputs: List of integers to execute as an Intcode program.
     :type inputs: list(int)
+    :param input: Specific input for the program execution.
+    :type input: int
+    :return: Final output of the program.
+    :rtype: int
     '''
-    # execute program (modifies the inputs in-place)
-    instruction_ptr = 0
-    while instruction_ptr is not None:
-        instruction_ptr = process_opcode(inputs, instruction_ptr)
-        if instruction_ptr == -1:
-            return None
+    with Debugger(inputs, [ input ]) as debugger:
+        debugger.run()
+        return debugger.last_output()
 
 # [ Base tests ]
 # --------------
 def make_tests():
     '''Performs tests on the provided examples to check the result of the
     computation functions is ok.'''
-    global INPUT
-    with Debugger() as debugger:
-        ### PART I
-        INPUT = 1
-        process_inputs([ 3,0,4,0,99 ])
-        assert debugger.last_output() == '1'
+    ### PART I
+    assert process_inputs([ 3,0,4,0,99 ], 1) == 1
     
-        ### PART II
-        INPUT = 0
-        process_inputs([ 3,12,6,12,15,1,13,14,13,4,13,99,-1,0,1,9 ])
-        assert debugger.last_output() == '0'
-        INPUT = 1
-        process_inputs([ 3,12,6,12,15,1,13,14,13,4,13,99,-1,0,1,9 ])
-        assert debugger.last_output() == '1'
-        
-        INPUT = 1
-        process_inputs([ 3,21,1008,21,8,20,1005,20,22,107,8,21,20,1006,20,31,
-            1106,0,36,98,0,0,1002,21,125,20,4,20,1105,1,46,104, 999,1105,1,46,
-            1101,1000,1,20,4,20,1105,1,46,98,99 ])
-        assert debugger.last_output() == '999'
-        INPUT = 8
-        process_inputs([ 3,21,1008,21,8,20,1005,20,22,107,8,21,20,1006,20,31,
-            1106,0,36,98,0,0,1002,21,125,20,4,20,1105,1,46,104, 999,1105,1,46,
-            1101,1000,1,20,4,20,1105,1,46,98,99 ])
-        assert debugger.last_output() == '1000'
-        INPUT = 12
-        process_inputs([ 3,21,1008,21,8,20,1005,20,22,107,8,21,20,1006,20,31,
-            1106,0,36,98,0,0,1002,21,125,20,4,20,1105,1,46,104, 999,1105,1,46,
-            1101,1000,1,20,4,20,1105,1,46,98,99 ])
-        assert debugger.last_output() == '1001'
+    ### PART II
+    assert process_inputs([ 3,12,6,12,15,1,13,14,13,4,13,99,-1,0,1,9 ], 0) == 0
+    assert process_inputs([ 3,12,6,12,15,1,13,14,13,4,13,99,-1,0,1,9 ], 1) == 1
+    program = [ 3,21,1008,21,8,20,1005,20,22,107,8,21,20,1006,20,31,
+        1106,0,36,98,0,0,1002,21,125,20,4,20,1105,1,46,104, 999,1105,1,46,
+        1101,1000,1,20,4,20,1105,1,46,98,99 ]
+    assert process_inputs(program, 1) == 999
+    assert process_inputs(program, 8) == 1000
+    assert process_inputs(program, 12) == 1001
+    
+    ### Debug features
+    debugger = Debugger(program, [ 8 ], breakpoints={ 6 }, watchpoints={ 20 })
+    event = debugger.run()
+    assert (event.kind, event.ip, event.address, event.value) == \
+        ('watchpoint', 2, 20, 1)
+    event = debugger.run()
+    assert (event.kind, event.ip) == ('breakpoint', 6)
+    event = debugger.run()
+    assert (event.kind, event.ip, event.address, event.value) == \
+        ('watchpoint', 22, 20, 1000)
+    event = debugger.run()
+    assert event.kind == 'halt' and debugger.outputs() == [ 1000 ]
+    debugger = Debugger([ 3,0,4,0,99 ])
+    assert debugger.run().kind == 'input'
+    debugger.core.inputs.append(42)
+    assert debugger.run().kind == 'halt' and debugger.last_output() == 42
 
 if __name__ == '__main__':
     # check function results on example cases
@@ -194,19 +189,12 @@ if __name__ == '__main__':
     
     # get input data
     data_path = '../data/day5.txt'
+    inputs = parse_input(open(data_path, 'r').read())
     
     ### PART I
-    INPUT = 1
-    inputs = parse_input(open(data_path, 'r').read())
-    with Debugger() as debugger:
-        process_inputs(inputs)
-        print('PART I: solution = {}'.format(debugger.last_output()))
+    solution = process_inputs(inputs, 1)
+    print('PART I: solution = {}'.format(solution))
     
     ### PART II
-    INPUT = 5
-    # (reparse inputs to get back original data)
-    inputs = parse_input(open(data_path, 'r').read())
-    with Debugger() as debugger:
-        process_inputs(inputs)
-        print('PART II: solution = {}'.format(debugger.last_output()))
-    
+    solution = process_inputs(inputs, 5)
+    print('PART II: solution = {}'.format(solution))
@@ -1,10 +1,10 @@
 ### =============================================
 ### [ ADVENT OF CODE ] (https://adventofcode.com)
-### 2018 - Mina Pêcheux: Python version
+### 2019 - Mina Pêcheux: Python version
 ### ---------------------------------------------
 ### Day 6: Universal Orbit Map
 ### =============================================
-import networkx as nx
+import numpy as np
 
 # [ Input parsing functions ]
 # ---------------------------
@@ -20,37 +20,143 @@ def parse_input(data):
 
 # [ Computation functions ]
 # -------------------------
+class OrbitTree(object):
+
+    '''Util class to represent the tree of orbits with flat arrays: each object
+    is given an integer index and the tree is stored as an array of parents (a
+    root is its own parent). The depths and the "binary lifting" table (the
+    ancestor 2^k levels above each object, for each k) are computed together by
+    pointer doubling, so that both parts are answered without walking the
+    orbits one by one.'''
+
+    def __init__(self, orbits):
+        '''Initialization function for a new OrbitTree.
+
+        :param orbits: List of orbit pairs in the form (object at the center of
+            the orbit, revolving object).
+        :type orbits: list(tuple(str))
+        '''
+        self.index = {}
+        centers, objects = [], []
+        for center, obj in orbits:
+            centers.append(self.index.setdefault(center, len(self.index)))
+            objects.append(self.index.setdefault(obj, len(self.index)))
+        self.names = list(self.index)
+        n = len(self.names)
+        # (32-bit indices halve the size of the lifting table)
+        self.parents = np.arange(n, dtype=np.int32 if n < 2 ** 31 else np.int64)
+        self.parents[objects] = centers
+        self.compute_ancestors()
+
+    def compute_ancestors(self):
+        '''Computes the depth of each object and the binary lifting table by
+        pointer doubling: at each step, every object jumps twice as far up the
+        tree as before (and adds the distance covered by its previous jump
+        target), until all jumps land on a root.'''
+        jumps = self.parents
+        distances = (jumps != np.arange(len(jumps))).astype(np.int64)
+        self.ancestors = [ jumps ]
+        while True:
+            next_jumps = jumps[jumps]
+            if np.array_equal(next_jumps, jumps):
+                break
+            distances = distances + distances[jumps]
+            jumps = next_jumps
+            self.ancestors.append(jumps)
+        self.depths = distances
+
+    def get_ancestor(self, node, height):
+        '''Gets the ancestor of a node a given number of levels above it.
+
+        :param node: Index of the node.
+        :type node: int
+        :param height: Number of levels to go up (lower or equal to the depth
+            of the node).
+        :type height: int
+        :return: Index of the ancestor.
+        :rtype: int
+        '''
+        k = 0
+        while height > 0:
+            if height & 1:
+                node = self.ancestors[k][node]
+            height >>= 1
+            k += 1
+        return node
+
+    def lowest_common_ancestor(self, a, b):
+        '''Gets the lowest common ancestor of two nodes: both nodes are first
+        brought to the same depth, then they jump up together by decreasing
+        powers of 2 as long as their ancestors differ.
+
+        :param a: Index of the first node.
+        :type a: int
+        :param b: Index of the second node.
+        :type b: int
+        :return: Index of the lowest common ancestor (or None if the nodes are
+            not in the same tree).
+        :rtype: int
+        '''
+        if self.depths[a] < self.depths[b]:
+            a, b = b, a
+        a = self.get_ancestor(a, self.depths[a] - self.depths[b])
+        if a == b:
+            return a
+        for jumps in reversed(self.ancestors):
+            if jumps[a] != jumps[b]:
+                a, b = jumps[a], jumps[b]
+        a, b = self.parents[a], self.parents[b]
+        return a if a == b else None
+
+    def distance(self, a, b):
+        '''Computes the number of edges on the path between two objects.
+
+        :param a: Name of the first object.
+        :type a: str
+        :param b: Name of the second object.
+        :type b: str
+        :return: Distance between the objects.
+        :rtype: int
+        '''
+        lca = self.lowest_common_ancestor(self.index[a], self.index[b])
+        if lca is None:
+            raise ValueError('Objects {} and {} are not in the same orbit '
+                'tree'.format(a, b))
+        a, b = self.index[a], self.index[b]
+        return int(self.depths[a] + self.depths[b] - 2 * self.depths[lca])
+
 ### PART I
 def count_orbits(orbits):
     '''Finds the number of direct and indirect orbits from the given list of
-    orbits.
+    orbits (i.e. the sum of the depths of all objects in the orbit tree).
     
     :param orbits: List of orbit pairs in the form (object at the center of the
         orbit, revolving object).
     :type orbits: list(tuple(str))
-    :return: Orbits count.
-    :rtype: int
+    :return: Orbit tree and orbits count.
+    :rtype: OrbitTree, int
     '''
-    G = nx.DiGraph()
-    G.add_edges_from(orbits)
-    return G, sum([
-        len(list(nx.edge_dfs(G, node, orientation='reverse'))) for node in G
-    ])
+    tree = OrbitTree(orbits)
+    return tree, int(tree.depths.sum())
 
 ### Part II
-def find_min_moves(graph):
+def find_min_moves(tree, source='YOU', target='SAN'):
     '''Finds the minimal number of orbital moves that have to be executed to
-    reach Santa! (The graph passed as parameter should probably be undirected
-    to allow for path search in any direction...)
+    reach Santa! This is the distance between the objects we and Santa are
+    revolving around, computed from their lowest common ancestor.
     
-    :param graph: Already computed graph to compute the orbital moves on.
-    :type graph: nx.Graph
+    :param tree: Already computed orbit tree to compute the orbital moves on.
+    :type tree: OrbitTree
+    :param source: Name of our object.
+    :type source: str
+    :param target: Name of Santa's object.
+    :type target: str
     :return: Minimal number of moves to get to Santa.
     :rtype: int
     '''
-    # remove 2 because we exclude the final nodes (that are include by NetworkX)
-    # and the move from our current position to the object we are revoving around
-    return len(nx.algorithms.shortest_path(graph, 'YOU', 'SAN')) - 3
+    source = tree.names[tree.parents[tree.index[source]]]
+    target = tree.names[tree.parents[tree.index[target]]]
+    return tree.distance(source, target)
 
 # [ Base tests ]
 # --------------
@@ -65,13 +171,27 @@ def make_tests():
     assert n_orbits == 42
         
     ### PART II
-    graph = nx.Graph()
-    graph.add_edges_from([
+    tree, _ = count_orbits([
         ('COM', 'B'), ('C', 'D'), ('B', 'C'), ('D', 'E'), ('E', 'F'),
         ('B', 'G'), ('G', 'H'), ('D', 'I'), ('E', 'J'), ('J', 'K'),
         ('K', 'L'), ('K', 'YOU'), ('I', 'SAN')
     ])
-    assert find_min_moves(graph) == 4
+    assert find_min_moves(tree) == 4
+    assert tree.distance('H', 'L') == 8
+    tree, _ = count_orbits([ ('COM', 'B'), ('X', 'Y') ])
+    try:
+        tree.distance('B', 'Y')
+        assert False
+    except ValueError:
+        pass
+    
+    ### Deep chains
+    n = 100000
+    chain = [ (str(i), str(i + 1)) for i in range(n) ] \
+        + [ (str(n // 2), 'YOU'), (str(n), 'SAN') ]
+    tree, n_orbits = count_orbits(chain)
+    assert n_orbits == n * (n + 1) // 2 + (n // 2 + 1) + (n + 1)
+    assert find_min_moves(tree) == n - n // 2
 
 if __name__ == '__main__':
     # check function results on example cases
@@ -82,12 +202,9 @@ if __name__ == '__main__':
     inputs = parse_input(open(data_path, 'r').read())
     
     ### PART I
-    directed_graph, solution = count_orbits(inputs)
+    tree, solution = count_orbits(inputs)
     print('PART I: solution = {}'.format(solution))
     
     ### PART II
-    # (transform the graph into an undirected one to allow path search in any
-    # direction)
-    undirected_graph = nx.Graph(directed_graph)
-    solution = find_min_moves(undirected_graph)
+    solution = find_min_moves(tree)
     print('PART II: solution = {}'.format(solution))
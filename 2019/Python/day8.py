@@ -4,12 +4,14 @@
 ### ---------------------------------------------
 ### Day 8: Space Image Format
 ### =============================================
+import numpy as np
 
 # [ Computation functions ]
 # -------------------------
 ### PART I
 def decode_layers(inputs, width, height):
-    '''Decodes the image layers by splitting it in even chunks.
+    '''Decodes the image layers by loading all the digits at once in a Numpy
+    array and reshaping it into even chunks.
     
     :param inputs: Content of the image (as a string).
     :type inputs: str
@@ -17,17 +19,20 @@ def decode_layers(inputs, width, height):
     :type width: int
     :param height: Height of each layer in the image.
     :type height: int
-    :return: Layers in the image.
-    :rtype: list(str)
+    :return: Layers in the image, of shape (n_layers, height, width).
+    :rtype: np.array(np.uint8)
     '''
     layer_size = width * height
     n_layers = len(inputs) // layer_size
-    return [ inputs[l*layer_size:(l+1)*layer_size] for l in range(n_layers) ]
+    digits = np.frombuffer(inputs.encode('ascii'), dtype=np.uint8,
+        count=n_layers * layer_size) - ord('0')
+    return digits.reshape(n_layers, height, width)
     
 def compute_checksum(inputs, width, height):
     '''Computes a basic checksum to verify the image is intact by finding the
-    layer that has the fewest layer and computing the product of its number of
-    1s and 2s.
+    layer that has the fewest 0s and computing the product of its number of
+    1s and 2s. The digits of all layers are counted with a single "bincount" by
+    offsetting each layer's digits by 10 times the layer index.
     
     :param inputs: Content of the image (as a string).
     :type inputs: str
@@ -35,49 +40,43 @@ def compute_checksum(inputs, width, height):
     :type width: int
     :param height: Height of each layer in the image.
     :type height: int
-    :return: Checksum to verify the image validity.
-    :rtype: int
+    :return: Checksum to verify the image validity, and layers of the image.
+    :rtype: int, np.array(np.uint8)
     '''
     layers = decode_layers(inputs, width, height)
-    best_n_zeros, best_value = None, None
-    for layer in layers:
-        n_zeros = layer.count('0')
-        if best_n_zeros is None or n_zeros < best_n_zeros:
-            n_ones = layer.count('1')
-            n_twos = layer.count('2')
-            best_n_zeros = n_zeros
-            best_value = n_ones * n_twos
-    return best_value, layers
+    n_layers = len(layers)
+    offsets = 10 * np.arange(n_layers, dtype=np.int64)[:, None]
+    counts = np.bincount((layers.reshape(n_layers, -1) + offsets).ravel(),
+        minlength=10 * n_layers).reshape(n_layers, 10)
+    best = np.argmin(counts[:, 0])
+    return int(counts[best, 1] * counts[best, 2]), layers
     
 ### Part II
-def display_message(layers, width, height):
+def compose_image(layers):
+    '''Stacks the layers of the image: each pixel takes the value of the first
+    layer where it is not transparent (pixels that are transparent in all
+    layers stay transparent).
+    
+    :param layers: Layers of the image, of shape (n_layers, height, width).
+    :type layers: np.array(np.uint8)
+    :return: Final image, of shape (height, width).
+    :rtype: np.array(np.uint8)
+    '''
+    first_visible = np.argmax(layers != 2, axis=0)
+    return np.take_along_axis(layers, first_visible[None], axis=0)[0]
+
+def display_message(layers):
     '''Displays the message that was sent (and has previously been divided into
     even layers).
     
-    :param layers: Layers of the image.
-    :type layers: list(str)
-    :param width: Width of each layer in the image.
-    :type width: int
-    :param height: Height of each layer in the image.
-    :type height: int
+    :param layers: Layers of the image, of shape (n_layers, height, width).
+    :type layers: np.array(np.uint8)
     '''
-    marker = '█'
-    # iterate through layers in reverse order to have the right depht overwrite
-    img = [ [ ' ' for _ in range(width) ] for _ in range(height) ]
-    for layer in layers[::-1]:
-        # go through grid
-        for y in range(height):
-            for x in range(width):
-                # and turn on/off pixels depending on the value (transparent has
-                # no impact)
-                if layer[x + y*width] == '1':
-                    img[y][x] = marker
-                elif layer[x + y*width] == '0':
-                    img[y][x] = ' '
+    img = np.where(compose_image(layers) == 1, '█', ' ')
     # display the message
     print('')
-    for y in range(height):
-        print(''.join(img[y]))
+    for row in img:
+        print(''.join(row))
     print('')
     
 # [ Base tests ]
@@ -85,14 +84,22 @@ def display_message(layers, width, height):
 def make_tests():
     '''Performs tests on the provided examples to check the result of the
     computation functions is ok.'''
-    assert decode_layers('123456789012', 3, 2) == [ '123456', '789012' ]
-    assert decode_layers('210012011212', 3, 2) == [ '210012', '011212' ]
+    assert decode_layers('123456789012', 3, 2).tolist() == \
+        [ [ [1,2,3], [4,5,6] ], [ [7,8,9], [0,1,2] ] ]
+    assert decode_layers('210012011212', 3, 2).tolist() == \
+        [ [ [2,1,0], [0,1,2] ], [ [0,1,1], [2,1,2] ] ]
 
     ### PART I
     c, _ = compute_checksum('123456789012', 3, 2)
     assert c == 1
     c, _ = compute_checksum('210012011212', 3, 2)
     assert c == 6
+    
+    ### PART II
+    layers = decode_layers('0222112222120000', 2, 2)
+    assert compose_image(layers).tolist() == [ [0,1], [1,0] ]
+    layers = decode_layers('2222' + '2102', 2, 2)
+    assert compose_image(layers).tolist() == [ [2,1], [0,2] ]
 
 if __name__ == '__main__':
     # check function results on example cases
@@ -107,6 +114,6 @@ if __name__ == '__main__':
     print('PART I: solution = {}'.format(solution))
     
     ### PART II
-    display_message(layers, 25, 6)
+    display_message(layers)
     print('PART II (see the shell)')
     
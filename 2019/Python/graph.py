@@ -0,0 +1,277 @@
+### =============================================
+### [ ADVENT OF CODE ] (https://adventofcode.com)
+### 2019 - Mina Pêcheux: Python version
+### ---------------------------------------------
+### Graph search toolkit used in multiple puzzles.
+### =============================================
+import heapq
+from collections import deque
+
+import numpy as np
+
+from grid import Grid
+
+UNREACHED = -1
+
+def manhattan_distance(a, b):
+    '''Computes the Manhattan distance between two (x, y) positions (this is
+    the default heuristic for A* searches in grid mazes).
+
+    :param a: First position.
+    :type a: tuple(int, int)
+    :param b: Second position.
+    :type b: tuple(int, int)
+    :return: Manhattan distance between the two positions.
+    :rtype: int
+    '''
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+class DistanceMap(Grid):
+
+    '''Util class to store an integer per cell of a rectangular grid (the
+    distances or the parents of a search). This is a Grid with fixed bounds
+    whose cells can also be accessed by flat index (through the "flat" view of
+    the storage), which is what the heap-based searches store.'''
+
+    def __init__(self, bounds, fill=UNREACHED):
+        '''Initialization function for a new DistanceMap.
+
+        :param bounds: Bounds of the grid (min_x, min_y, max_x, max_y).
+        :type bounds: tuple(int, int, int, int)
+        :param fill: Initial value of all the cells.
+        :type fill: int
+        '''
+        super().__init__(fill=fill, dtype=np.int64, capacity=0)
+        self.min_x, self.min_y, self.max_x, self.max_y = bounds
+        self.set_data(np.full((self.max_y - self.min_y + 1,
+            self.max_x - self.min_x + 1), fill, dtype=np.int64))
+        self.origin_x, self.origin_y = self.min_x, self.min_y
+
+    def set_data(self, data):
+        '''Replaces the storage array of the grid (and its flat view).
+
+        :param data: New storage array, of shape (height, width).
+        :type data: np.array
+        '''
+        super().set_data(data)
+        self.flat = memoryview(data.reshape(-1))
+
+    def in_bounds(self, position):
+        '''Checks if a position is inside of the fixed bounds of the grid.
+
+        :param position: Position to check.
+        :type position: tuple(int, int)
+        :return: Whether or not the position is inside of the bounds.
+        :rtype: bool
+        '''
+        x, y = position
+        return 0 <= x - self.origin_x < self.width \
+            and 0 <= y - self.origin_y < self.height
+
+    def index(self, position):
+        '''Gets the flat index of a position in the storage.
+
+        :param position: Position to convert.
+        :type position: tuple(int, int)
+        :return: Flat index.
+        :rtype: int
+        '''
+        x, y = position
+        return (y - self.origin_y) * self.width + (x - self.origin_x)
+
+def iter_bfs(source, get_neighbors, distances, parents=None):
+    '''Runs a breadth-first search from a source position and yields the
+    positions in order of discovery, along with their distance to the source.
+    The visited cells are marked directly in the given distance map (cells that
+    already have a distance are never visited again). Neighbors outside of the
+    bounds of the map are ignored.
+
+    :param source: Start position of the search.
+    :type source: tuple(int, int)
+    :param get_neighbors: Function that returns the accessible neighbors of a
+        position.
+    :type get_neighbors: func
+    :param distances: Distance map to fill.
+    :type distances: DistanceMap
+    :param parents: If not None, map to fill with the flat index of the parent
+        of each discovered position.
+    :type parents: DistanceMap
+    :return: Generator of discovered positions and their distance.
+    :rtype: generator(tuple(tuple(int, int), int))
+    '''
+    distances[source] = 0
+    queue = deque([ (source, 0) ])
+    yield source, 0
+    while queue:
+        position, dist = queue.popleft()
+        index = distances.index(position)
+        for neighbor in get_neighbors(position):
+            # (the map must not grow: the flat indices of the parents would
+            # be shifted)
+            if not distances.in_bounds(neighbor) \
+                or distances[neighbor] != UNREACHED:
+                continue
+            distances[neighbor] = dist + 1
+            if parents is not None:
+                parents[neighbor] = index
+            queue.append((neighbor, dist + 1))
+            yield neighbor, dist + 1
+
+def dijkstra(source, get_neighbors, bounds, target=None, heuristic=None,
+    get_weight=None):
+    '''Computes the shortest distances from a source position with a
+    heap-based Dijkstra algorithm. If a heuristic is given (and a target), the
+    search is an A* search instead. Neighbors outside of the bounds are
+    ignored.
+
+    :param source: Start position of the search.
+    :type source: tuple(int, int)
+    :param get_neighbors: Function that returns the accessible neighbors of a
+        position.
+    :type get_neighbors: func
+    :param bounds: Bounds of the grid (min_x, min_y, max_x, max_y).
+    :type bounds: tuple(int, int, int, int)
+    :param target: If not None, position to stop the search at.
+    :type target: tuple(int, int)
+    :param heuristic: If not None, function that estimates the remaining
+        distance between two positions (it must never overestimate it).
+    :type heuristic: func
+    :param get_weight: If not None, function that returns the weight of the
+        edge between two positions. Else, all weights are equal to 1.
+    :type get_weight: func
+    :return: Distance map and parents map.
+    :rtype: DistanceMap, DistanceMap
+    '''
+    distances = DistanceMap(bounds)
+    parents = DistanceMap(bounds)
+    done = bytearray(distances.width * distances.height)
+    source_index = distances.index(source)
+    target_index = None if target is None else distances.index(target)
+    distances.flat[source_index] = 0
+    heap = [ (0, source_index) ]
+    while heap:
+        _, index = heapq.heappop(heap)
+        if done[index]:
+            continue
+        done[index] = 1
+        if index == target_index:
+            break
+        dist = distances.flat[index]
+        position = distances.position(index)
+        for neighbor in get_neighbors(position):
+            if not distances.in_bounds(neighbor):
+                continue
+            n = distances.index(neighbor)
+            if done[n]:
+                continue
+            weight = 1 if get_weight is None else get_weight(position, neighbor)
+            new_dist = dist + weight
+            old_dist = distances.flat[n]
+            if old_dist == UNREACHED or new_dist < old_dist:
+                distances.flat[n] = new_dist
+                parents.flat[n] = index
+                priority = new_dist
+                if heuristic is not None:
+                    priority += heuristic(neighbor, target)
+                heapq.heappush(heap, (priority, n))
+    return distances, parents
+
+def astar(source, target, get_neighbors, bounds, heuristic=manhattan_distance):
+    '''Computes the shortest distance between two positions with an A* search.
+
+    :param source: Start position of the search.
+    :type source: tuple(int, int)
+    :param target: Target position of the search.
+    :type target: tuple(int, int)
+    :param get_neighbors: Function that returns the accessible neighbors of a
+        position.
+    :type get_neighbors: func
+    :param bounds: Bounds of the grid (min_x, min_y, max_x, max_y).
+    :type bounds: tuple(int, int, int, int)
+    :param heuristic: Function that estimates the remaining distance between
+        two positions (it must never overestimate it).
+    :type heuristic: func
+    :return: Distance map and parents map.
+    :rtype: DistanceMap, DistanceMap
+    '''
+    return dijkstra(source, get_neighbors, bounds, target=target,
+        heuristic=heuristic)
+
+def reconstruct_path(distances, parents, target):
+    '''Works back through the parents map to get the path from the source of
+    a search to a target.
+
+    :param distances: Distance map filled by the search.
+    :type distances: DistanceMap
+    :param parents: Parents map filled by the search.
+    :type parents: DistanceMap
+    :param target: Target position of the path.
+    :type target: tuple(int, int)
+    :return: Path from the source to the target (both included), or None if
+        the target was not reached.
+    :rtype: list(tuple(int, int))
+    '''
+    if distances.get(target) is None:
+        return None
+    path = []
+    index = distances.index(target)
+    while index != UNREACHED:
+        path.append(distances.position(index))
+        index = parents.flat[index]
+    return path[::-1]
+
+# [ Base tests ]
+# --------------
+def make_tests():
+    '''Performs tests on small mazes to check the searches are ok.'''
+    # (maze with negative coordinates: the walls are "#", the top-left corner
+    # is at (-2, -1), and the bottom-right corner cannot be reached)
+    maze = [
+        '.....',
+        '.#.#.',
+        '...#.',
+        '.#.##',
+        '...#.',
+    ]
+    bounds = (-2, -1, 2, 3)
+    def get_neighbors(position):
+        # (neighbors outside of the bounds are returned too)
+        x, y = position
+        return [ (x + dx, y + dy) for dx, dy in [ (0, -1), (1, 0), (0, 1), (-1, 0) ]
+            if not (0 <= y + dy + 1 < 5 and 0 <= x + dx + 2 < 5)
+            or maze[y + dy + 1][x + dx + 2] != '#' ]
+    source, target = (-2, -1), (0, 3)
+    
+    ### BFS
+    distances = DistanceMap(bounds)
+    parents = DistanceMap(bounds)
+    order = list(iter_bfs(source, get_neighbors, distances, parents))
+    assert order[0] == (source, 0) and len(order) == 17
+    assert distances.data.shape == (5, 5)
+    assert distances[target] == 6 and distances[2, 3] == UNREACHED
+    path = reconstruct_path(distances, parents, target)
+    assert path[0] == source and path[-1] == target and len(path) == 7
+    assert reconstruct_path(distances, parents, (2, 3)) is None
+    
+    ### Dijkstra and A*
+    distances, parents = dijkstra(source, get_neighbors, bounds)
+    assert distances[target] == 6 and distances[2, 3] == UNREACHED
+    distances, parents = astar(source, target, get_neighbors, bounds)
+    assert distances[target] == 6
+    assert len(reconstruct_path(distances, parents, target)) == len(path)
+    distances, parents = astar(source, (2, 3), get_neighbors, bounds)
+    assert reconstruct_path(distances, parents, (2, 3)) is None
+    distances, parents = astar(source, source, get_neighbors, bounds)
+    assert reconstruct_path(distances, parents, source) == [ source ]
+    # (weighted edges: going down the left column costs 10, so the path goes
+    # around the wall through the middle column instead)
+    def get_weight(a, b):
+        return 10 if b[1] > a[1] and a[0] == -2 else 1
+    distances, parents = dijkstra(source, get_neighbors, bounds,
+        get_weight=get_weight)
+    assert distances[-2, 1] == 6
+    assert reconstruct_path(distances, parents, (-2, 1))[1] == (-1, -1)
+
+if __name__ == '__main__':
+    # check the searches on small examples
+    make_tests()
@@ -0,0 +1,439 @@
+### =============================================
+### [ ADVENT OF CODE ] (https://adventofcode.com)
+### 2019 - Mina Pêcheux: Python version
+### ---------------------------------------------
+### 2D grid storage used in multiple puzzles.
+### =============================================
+import numpy as np
+
+# neighbor offsets (up, right, down, left)
+NEIGHBOR_OFFSETS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+class Grid(object):
+
+    '''Util class to store a value per cell of an unbounded 2D grid in a NumPy
+    array, rather than in a dict keyed by (x, y) tuples. The array grows
+    automatically (doubling its size in the needed direction) when a cell
+    outside of it is written, and it is offset so that coordinates can be
+    negative. A special "fill" value marks the cells that were never written.
+    The bounds of the written cells are updated on each write so that they are
+    always available without going through the whole grid.'''
+
+    def __init__(self, fill=-1, dtype=np.int8, capacity=16):
+        '''Initialization function for a new Grid.
+
+        :param fill: Value of the cells that were never written.
+        :type fill: int
+        :param dtype: Type of the values stored in the cells.
+        :type dtype: np.dtype
+        :param capacity: Initial width and height of the storage.
+        :type capacity: int
+        '''
+        self.fill = fill
+        self.set_data(np.full((capacity, capacity), fill, dtype=dtype))
+        # coordinates of the cell stored at data[0, 0]
+        self.origin_x = self.origin_y = -(capacity // 2)
+        self.min_x = self.min_y = self.max_x = self.max_y = None
+
+    @staticmethod
+    def from_array(array, fill=0, border=0):
+        '''Creates a grid from an array of values (the first cell of the array
+        is at (0, 0)).
+
+        :param array: Values of the cells, of shape (height, width).
+        :type array: np.array
+        :param fill: Value of the cells that are outside of the array.
+        :type fill: int
+        :param border: Number of fill cells to add around the array (so that
+            the neighbors of the array cells are always in the storage).
+        :type border: int
+        :return: Grid of values.
+        :rtype: Grid
+        '''
+        h, w = array.shape
+        grid = Grid(fill=fill, dtype=array.dtype, capacity=0)
+        data = np.full((h + 2 * border, w + 2 * border), fill, dtype=array.dtype)
+        data[border:border+h, border:border+w] = array
+        grid.set_data(data)
+        grid.origin_x = grid.origin_y = -border
+        grid.min_x, grid.min_y = 0, 0
+        grid.max_x, grid.max_y = w - 1, h - 1
+        return grid
+
+    @staticmethod
+    def from_lines(lines, fill=ord('#'), border=0):
+        '''Creates a grid of ASCII codes from lines of text (the first character
+        of the first line is at (0, 0)). Lines shorter than the longest one are
+        completed with the fill value.
+
+        :param lines: Lines of text to read.
+        :type lines: list(str)
+        :param fill: ASCII code of the cells that are outside of the text.
+        :type fill: int
+        :param border: Number of fill cells to add around the text (so that
+            the neighbors of the text cells are always in the storage).
+        :type border: int
+        :return: Grid of ASCII codes.
+        :rtype: Grid
+        '''
+        width = max([ len(line) for line in lines ])
+        chars = np.full((len(lines), width), fill, dtype=np.uint8)
+        for y, line in enumerate(lines):
+            chars[y, :len(line)] = np.frombuffer(line.encode('ascii'),
+                dtype=np.uint8)
+        return Grid.from_array(chars, fill=fill, border=border)
+
+    def set_data(self, data):
+        '''Replaces the storage array of the grid.
+
+        :param data: New storage array, of shape (height, width).
+        :type data: np.array
+        '''
+        self.data = data
+        self.height, self.width = data.shape
+        # (single cells are accessed through a memoryview, which is quicker
+        # than NumPy's indexing and gives back Python scalars)
+        self._view = memoryview(data)
+
+    def __contains__(self, position):
+        return self.get(position) is not None
+
+    def __getitem__(self, position):
+        x, y = position
+        x -= self.origin_x
+        y -= self.origin_y
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self._view[y, x]
+        return self.fill
+
+    def __setitem__(self, position, value):
+        x, y = position
+        if self.min_x is None:
+            self.min_x = self.max_x = x
+            self.min_y = self.max_y = y
+        else:
+            if x < self.min_x: self.min_x = x
+            elif x > self.max_x: self.max_x = x
+            if y < self.min_y: self.min_y = y
+            elif y > self.max_y: self.max_y = y
+        if not (0 <= x - self.origin_x < self.width \
+            and 0 <= y - self.origin_y < self.height):
+            self.grow(x, y)
+        self._view[y - self.origin_y, x - self.origin_x] = value
+
+    def get(self, position, default=None):
+        '''Gets the value of a cell, or a default if it was never written.
+
+        :param position: Position of the cell.
+        :type position: tuple(int, int)
+        :param default: Value to return for cells that were never written.
+        :type default: any
+        :return: Cell value.
+        :rtype: int
+        '''
+        v = self[position]
+        return default if v == self.fill else v
+
+    def grow(self, x, y):
+        '''Grows the storage so that it contains a given cell: the size is
+        doubled in each direction where it is needed (or more, if the cell is
+        further away) and the current data is copied in the new array.
+
+        :param x: Horizontal coordinate of the cell.
+        :type x: int
+        :param y: Vertical coordinate of the cell.
+        :type y: int
+        '''
+        h, w = self.data.shape
+        left = right = top = bottom = 0
+        if x < self.origin_x:
+            left = max(w, self.origin_x - x)
+        elif x >= self.origin_x + w:
+            right = max(w, x - self.origin_x - w + 1)
+        if y < self.origin_y:
+            top = max(h, self.origin_y - y)
+        elif y >= self.origin_y + h:
+            bottom = max(h, y - self.origin_y - h + 1)
+        data = np.full((h + top + bottom, w + left + right), self.fill,
+            dtype=self.data.dtype)
+        data[top:top+h, left:left+w] = self.data
+        self.set_data(data)
+        self.origin_x -= left
+        self.origin_y -= top
+
+    def bounds(self):
+        '''Gets the bounds of the written cells.
+
+        :return: Bounds of the grid (min_x, min_y, max_x, max_y).
+        :rtype: tuple(int, int, int, int)
+        '''
+        return self.min_x, self.min_y, self.max_x, self.max_y
+
+    def to_array(self):
+        '''Gets the part of the storage that is inside the bounds of the
+        written cells (as a view, not a copy).
+
+        :return: Values of the cells, of shape (height, width).
+        :rtype: np.array
+        '''
+        if self.min_x is None:
+            return self.data[:0, :0]
+        return self.data[self.min_y - self.origin_y:self.max_y - self.origin_y + 1,
+            self.min_x - self.origin_x:self.max_x - self.origin_x + 1]
+
+    def to_index(self, position):
+        '''Gets the (row, column) index of a position in the array returned by
+        the to_array() method.
+
+        :param position: Position to convert.
+        :type position: tuple(int, int)
+        :return: Index in the bounded array.
+        :rtype: tuple(int, int)
+        '''
+        x, y = position
+        return y - self.min_y, x - self.min_x
+
+    def flat_offsets(self):
+        '''Gets the neighbor offsets as differences of flat indices in the
+        storage (for vectorized searches on the raveled data).
+
+        :return: Flat neighbor offsets.
+        :rtype: np.array(int)
+        '''
+        w = self.data.shape[1]
+        return np.array([ dx + dy * w for dx, dy in NEIGHBOR_OFFSETS ],
+            dtype=np.int64)
+
+    def position(self, index):
+        '''Gets the position matching a flat index in the storage.
+
+        :param index: Flat index to convert.
+        :type index: int
+        :return: Position.
+        :rtype: tuple(int, int)
+        '''
+        y, x = divmod(int(index), self.data.shape[1])
+        return (x + self.origin_x, y + self.origin_y)
+
+    def count(self, value):
+        '''Counts the cells that have a given value.
+
+        :param value: Value to count.
+        :type value: int
+        :return: Number of cells with this value.
+        :rtype: int
+        '''
+        return int(np.count_nonzero(self.data == value))
+
+    def lookup(self, table, default):
+        '''Maps the values of the cells (inside the bounds) through a lookup
+        table, in one vectorized step.
+
+        :param table: Output for each cell value.
+        :type table: dict(int, any)
+        :param default: Output for the values that are not in the table.
+        :type default: any
+        :return: Mapped values, of shape (height, width) + shape of the outputs.
+        :rtype: np.array
+        '''
+        values = self.to_array().astype(np.int64)
+        keys = sorted(table)
+        outputs = np.array([ table[k] for k in keys ] + [ default ])
+        index = np.searchsorted(keys, values)
+        index[index == len(keys)] = len(keys) - 1
+        known = np.array(keys, dtype=np.int64)[index] == values
+        return outputs[np.where(known, index, len(keys))]
+
+    def render(self, chars, default=' '):
+        '''Gets the string representation of the grid (inside the bounds).
+
+        :param chars: Character of each cell value.
+        :type chars: dict(int, str)
+        :param default: Character of the values that are not in the table.
+        :type default: str
+        :return: Rendered grid.
+        :rtype: str
+        '''
+        return render_chars(self.lookup(chars, default))
+
+    def to_image(self, colors, default=(0, 0, 0), scale=10):
+        '''Gets the RGB image of the grid (inside the bounds), with each cell
+        drawn as a square of the given scale.
+
+        :param colors: RGB color of each cell value.
+        :type colors: dict(int, tuple(int, int, int))
+        :param default: Color of the values that are not in the table.
+        :type default: tuple(int, int, int)
+        :param scale: Size of each cell in the image (in pixels).
+        :type scale: int
+        :return: RGB image, of shape (height * scale, width * scale, 3).
+        :rtype: np.array(np.uint8)
+        '''
+        return scale_image(self.lookup(colors, default).astype(np.uint8), scale)
+
+    def neighbors(self, position):
+        '''Gets the positions around a cell.
+
+        :param position: Position of the cell.
+        :type position: tuple(int, int)
+        :return: Positions of the 4 neighbors (up, right, down, left).
+        :rtype: list(tuple(int, int))
+        '''
+        x, y = position
+        return [ (x + dx, y + dy) for dx, dy in NEIGHBOR_OFFSETS ]
+
+def render_chars(chars):
+    '''Joins a 2D array of characters into a multi-line string.
+
+    :param chars: Characters to join, of shape (height, width).
+    :type chars: np.array(str)
+    :return: Rendered characters.
+    :rtype: str
+    '''
+    return '\n'.join([ ''.join(row) for row in chars ])
+
+def scale_image(image, scale):
+    '''Scales an image up by repeating each pixel in a square block.
+
+    :param image: Image to scale, of shape (height, width, 3).
+    :type image: np.array(np.uint8)
+    :param scale: Size of the blocks.
+    :type scale: int
+    :return: Scaled image.
+    :rtype: np.array(np.uint8)
+    '''
+    return np.repeat(np.repeat(image, scale, axis=0), scale, axis=1)
+
+def shifted(array, dx, dy, fill=False):
+    '''Gets the values of the neighbor cells at a given offset for all cells of
+    an array at once (cells whose neighbor is outside of the array get the fill
+    value).
+
+    :param array: Values to shift, of shape (height, width).
+    :type array: np.array
+    :param dx: Horizontal offset of the neighbors.
+    :type dx: int
+    :param dy: Vertical offset of the neighbors.
+    :type dy: int
+    :param fill: Value for the neighbors outside of the array.
+    :type fill: any
+    :return: Shifted values (out[y, x] = array[y + dy, x + dx]).
+    :rtype: np.array
+    '''
+    h, w = array.shape
+    out = np.full(array.shape, fill, dtype=array.dtype)
+    out[max(0, -dy):min(h, h - dy), max(0, -dx):min(w, w - dx)] = \
+        array[max(0, dy):min(h, h + dy), max(0, dx):min(w, w + dx)]
+    return out
+
+# [ Base tests ]
+# --------------
+def make_tests():
+    '''Performs tests on small grids to check the storage and the helpers of
+    the Grid class are ok.'''
+    ### Auto-growth and negative coordinates
+    grid = Grid(capacity=4)
+    grid[0, 0] = 1
+    grid[-10, 3] = 2
+    grid[5, -7] = 3
+    assert grid.data.shape[0] >= 11 and grid.data.shape[1] >= 16
+    assert (grid[0, 0], grid[-10, 3], grid[5, -7]) == (1, 2, 3)
+    assert grid[100, 100] == -1 and grid[-3, -3] == -1
+    assert grid.bounds() == (-10, -7, 5, 3)
+    assert grid.to_array().shape == (11, 16)
+    assert grid.to_array()[grid.to_index((-10, 3))] == 2
+    ### Fill value
+    assert (0, 0) in grid and (1, 1) not in grid and (100, 100) not in grid
+    grid[0, 0] = -1
+    assert (0, 0) not in grid and grid.get((0, 0), 7) == 7
+    ### Text parsing
+    grid = Grid.from_lines([ '#.', '.#.' ], fill=ord('x'), border=1)
+    assert grid.bounds() == (0, 0, 2, 1)
+    assert grid.data.shape == (4, 5)
+    assert grid[-1, -1] == ord('x') and grid[2, 0] == ord('x')
+    assert grid[0, 0] == ord('#') and grid[1, 1] == ord('#')
+    assert grid.position(grid.width + 1) == (0, 0)
+    assert grid.render({ ord('#'): '#', ord('.'): '.' }, '?') == '#.?\n.#.'
+    ### Lookup
+    table = { ord('#'): 1, ord('.'): 0 }
+    assert grid.lookup(table, 9).tolist() == [ [ 1, 0, 9 ], [ 0, 1, 0 ] ]
+
+# [ Benchmarks ]
+# --------------
+def benchmark(n_steps=1000000, seed=0):
+    '''Compares the Grid class to a dict keyed by (x, y) tuples on a random
+    walk (as a painting robot or a maze explorer does): time to write the
+    cells, to read them back, to get the bounds and to render the board, and
+    memory used by the board.
+
+    :param n_steps: Number of steps of the random walk.
+    :type n_steps: int
+    :param seed: Seed of the random walk.
+    :type seed: int
+    :return: Measures for each board type.
+    :rtype: dict(str, dict(str, float))
+    '''
+    import time
+    import tracemalloc
+    rng = np.random.default_rng(seed)
+    moves = np.array(NEIGHBOR_OFFSETS)[rng.integers(0, 4, n_steps)]
+    walk = np.cumsum(moves, axis=0).tolist()
+    walk = [ (x, y) for x, y in walk ]
+    results = {}
+
+    def dict_render(board):
+        x, y = zip(*board.keys())
+        min_x, max_x, min_y, max_y = min(x), max(x), min(y), max(y)
+        return '\n'.join([ ''.join([ '#' if board.get((x, y), 0) else ' '
+            for x in range(min_x, max_x + 1) ]) for y in range(min_y, max_y + 1) ])
+
+    for name in [ 'dict', 'grid' ]:
+        measures = {}
+        t = time.perf_counter()
+        board = {} if name == 'dict' else Grid()
+        for i, position in enumerate(walk):
+            board[position] = i & 1
+        measures['write'] = time.perf_counter() - t
+        t = time.perf_counter()
+        total = 0
+        for position in walk:
+            total += board[position]
+        measures['read'] = time.perf_counter() - t
+        t = time.perf_counter()
+        if name == 'dict':
+            x, y = zip(*board.keys())
+            min(x), max(x), min(y), max(y)
+        else:
+            board.bounds()
+        measures['bounds'] = time.perf_counter() - t
+        t = time.perf_counter()
+        if name == 'dict':
+            dict_render(board)
+        else:
+            board.render({ 1: '#' })
+        measures['render'] = time.perf_counter() - t
+        # (the memory is measured in a separate run since tracing the
+        # allocations slows the execution down)
+        del board
+        tracemalloc.start()
+        board = {} if name == 'dict' else Grid()
+        for i, position in enumerate(walk):
+            board[position] = i & 1
+        measures['memory'] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del board
+        results[name] = measures
+    return results
+
+if __name__ == '__main__':
+    # check the grid on small examples
+    make_tests()
+    
+    results = benchmark()
+    print('{:8s} {:>10s} {:>10s} {:>10s} {:>10s} {:>12s}'.format(
+        'board', 'write (s)', 'read (s)', 'bounds (s)', 'render (s)',
+        'memory (MB)'))
+    for name, m in results.items():
+        print('{:8s} {:10.3f} {:10.3f} {:10.4f} {:10.3f} {:12.1f}'.format(name,
+            m['write'], m['read'], m['bounds'], m['render'],
+            m['memory'] / 1e6))
@@ -4,6 +4,8 @@
 ### ---------------------------------------------
 ### Intcode interpreter used in multiple puzzles.
 ### =============================================
+from collections import deque
+
 OPERATIONS = {
     1: ('add', lambda a, b: a + b, 3),
     2: ('mult', lambda a, b: a * b, 3),
@@ -343,3 +345,449 @@ class IntcodeProgram(object):
             print(self._debug_str)
         
         return pause
+
+# [ Low-overhead execution core ]
+# --------------------------------
+# status codes returned by IntcodeCore.step()
+STEP_OK = 'ok'
+STEP_OUTPUT = 'output'
+STEP_NEED_INPUT = 'input'
+STEP_HALT = 'halt'
+STEP_ERROR = 'error'
+
+# cache of the decoded instructions (opcode and parameter modes)
+_DECODED = {}
+
+def decode_instruction(instruction):
+    '''Splits an instruction into its opcode and the modes of its 3 (possible)
+    parameters. The result is cached since programs only use a handful of
+    different instructions.
+
+    :param instruction: Instruction to decode.
+    :type instruction: int
+    :return: Opcode and parameter modes.
+    :rtype: tuple(int, int, int, int)
+    '''
+    decoded = _DECODED.get(instruction)
+    if decoded is None:
+        modes, opcode = divmod(instruction, 100)
+        decoded = (opcode, modes % 10, modes // 10 % 10, modes // 100 % 10)
+        _DECODED[instruction] = decoded
+    return decoded
+
+class IntcodeCore(object):
+
+    '''Util class to execute an Intcode program with as little overhead as
+    possible: the memory is a flat list (grown on demand), instructions are
+    decoded through a cache and no debug string is ever built. It is meant to
+    be driven step by step by a front-end (e.g. a debugger) that inspects the
+    status of each step, the instruction pointer and the last written address.'''
+
+    def __init__(self, program, inputs=None):
+        '''Initialization function for a new IntcodeCore.
+
+        :param program: Original Intcode program to execute (will be copied to
+            avoid in-place modification).
+        :type program: list(int)
+        :param inputs: Initial inputs of the program.
+        :type inputs: list(int)
+        '''
+        self.memory = list(program)
+        self.inputs = deque(inputs or [])
+        self.outputs = []
+        self.ip = 0
+        self.relative_base = 0
+        self.last_write = None
+
+    def address(self, ptr, mode):
+        '''Gets the address of a parameter depending on its mode.
+
+        :param ptr: Position of the parameter in the memory.
+        :type ptr: int
+        :param mode: Mode of the parameter (0 for "address", 1 for "immediate
+            value", 2 for "relative").
+        :type mode: int
+        :return: Address of the parameter value.
+        :rtype: int
+        '''
+        if mode == 1:
+            return ptr
+        addr = self.memory[ptr] if ptr < len(self.memory) else 0
+        return addr if mode == 0 else addr + self.relative_base
+
+    def read(self, address):
+        '''Reads a value in the memory (addresses beyond the current memory
+        size contain 0).
+
+        :param address: Address to read.
+        :type address: int
+        :return: Memory value.
+        :rtype: int
+        '''
+        return self.memory[address] if address < len(self.memory) else 0
+
+    def write(self, address, value):
+        '''Writes a value in the memory, and grows it if needed.
+
+        :param address: Address to write at.
+        :type address: int
+        :param value: Value to write.
+        :type value: int
+        '''
+        memory = self.memory
+        if address >= len(memory):
+            memory.extend([ 0 ] * (address + 1 - len(memory)))
+        memory[address] = value
+        self.last_write = address
+
+    def step(self):
+        '''Executes the instruction at the current instruction pointer.
+
+        :return: Status of the step (STEP_OK, STEP_OUTPUT if the instruction
+            produced an output, STEP_NEED_INPUT if it needs an input and there is
+            none - the instruction pointer does not move then -, STEP_HALT or
+            STEP_ERROR).
+        :rtype: str
+        '''
+        ip = self.ip
+        opcode, ma, mb, mc = decode_instruction(self.read(ip))
+        self.last_write = None
+        if opcode == 1 or opcode == 2 or opcode == 7 or opcode == 8:
+            a = self.read(self.address(ip + 1, ma))
+            b = self.read(self.address(ip + 2, mb))
+            if opcode == 1:
+                v = a + b
+            elif opcode == 2:
+                v = a * b
+            elif opcode == 7:
+                v = int(a < b)
+            else:
+                v = int(a == b)
+            self.write(self.address(ip + 3, mc), v)
+            self.ip = ip + 4
+        elif opcode == 5 or opcode == 6:
+            a = self.read(self.address(ip + 1, ma))
+            if (a != 0) == (opcode == 5):
+                self.ip = self.read(self.address(ip + 2, mb))
+            else:
+                self.ip = ip + 3
+        elif opcode == 3:
+            if not self.inputs:
+                return STEP_NEED_INPUT
+            self.write(self.address(ip + 1, ma), self.inputs.popleft())
+            self.ip = ip + 2
+        elif opcode == 4:
+            self.outputs.append(self.read(self.address(ip + 1, ma)))
+            self.ip = ip + 2
+            return STEP_OUTPUT
+        elif opcode == 9:
+            self.relative_base += self.read(self.address(ip + 1, ma))
+            self.ip = ip + 2
+        elif opcode == 99:
+            return STEP_HALT
+        else:
+            return STEP_ERROR
+        return STEP_OK
+
+    def push_ascii(self, data):
+        '''Appends ASCII-encoded data to the inputs of the program (each byte
+        is one input value).
+
+        :param data: Data to append.
+        :type data: bytes
+        '''
+        self.inputs.extend(data)
+
+    def run(self, max_outputs=None):
+        '''Runs the program until it halts, errors or needs an input (or until
+        it has produced a given number of outputs).
+
+        :param max_outputs: If not None, number of outputs to produce before
+            returning (with the STEP_OUTPUT status).
+        :type max_outputs: int
+        :return: Status of the last step.
+        :rtype: str
+        '''
+        step = self.step
+        n_outputs = 0
+        while True:
+            status = step()
+            if status == STEP_OUTPUT:
+                n_outputs += 1
+                if n_outputs == max_outputs:
+                    return status
+            elif status != STEP_OK:
+                return status
+
+class AsciiOutput(object):
+
+    '''Util class to collect the ASCII outputs of a program in a bytearray
+    (rather than in a list of integers that has to be joined back into a
+    string) and to cut it into frames as the output arrives. The search for the
+    frame separator only goes through the bytes that arrived since the last
+    search, and the bytes of the frames that were already returned can be
+    dropped. Values that are not ASCII characters are kept aside.'''
+
+    def __init__(self, separator=b'\n\n'):
+        '''Initialization function for a new AsciiOutput.
+
+        :param separator: Bytes that end a frame.
+        :type separator: bytes
+        '''
+        self.separator = separator
+        self.buffer = bytearray()
+        self.values = []
+        self._start = 0 # start of the current (unfinished) frame
+        self._scan = 0 # position to resume the search for a separator from
+
+    def drain(self, core):
+        '''Moves the outputs of a program core to the buffer.
+
+        :param core: Program core to get the outputs of.
+        :type core: IntcodeCore
+        '''
+        outputs = core.outputs
+        try:
+            chunk = bytes(outputs)
+        except ValueError:
+            chunk = None
+        if chunk is not None and chunk.isascii():
+            self.buffer += chunk
+        else:
+            # (some values are not ASCII characters: add the values one by one)
+            for v in outputs:
+                if 0 <= v < 128:
+                    self.buffer.append(v)
+                else:
+                    self.values.append(v)
+        del outputs[:]
+
+    def view(self):
+        '''Gets a view of the buffered bytes that are not part of a returned
+        frame yet, without copying them (the view must be released before
+        calling drain() or compact(), since the buffer cannot be resized while
+        it is exported).
+
+        :return: View of the pending bytes.
+        :rtype: memoryview
+        '''
+        return memoryview(self.buffer)[self._start:]
+
+    def text(self):
+        '''Decodes the pending bytes as a string.
+
+        :return: Pending text.
+        :rtype: str
+        '''
+        with self.view() as pending:
+            return str(pending, 'ascii')
+
+    def frames(self):
+        '''Generates the frames that were completed since the last call.
+
+        :return: Generator of the complete frames (without the separator).
+        :rtype: generator(bytes)
+        '''
+        buffer, separator = self.buffer, self.separator
+        while True:
+            end = buffer.find(separator, self._scan)
+            if end < 0:
+                # (a separator may start in the last bytes of the buffer)
+                self._scan = max(self._start, len(buffer) - len(separator) + 1)
+                return
+            frame = bytes(buffer[self._start:end])
+            self._start = self._scan = end + len(separator)
+            yield frame
+
+    def compact(self):
+        '''Drops the bytes of the frames that were already returned.'''
+        del self.buffer[:self._start]
+        self._scan -= self._start
+        self._start = 0
+
+class SymbolicExecutionError(Exception):
+    
+    '''Exception raised when a symbolic execution reaches an instruction that
+    depends on the actual value of a symbol (jump, comparison, address or
+    self-modified instruction).'''
+    
+    pass
+
+class SymbolicValue(object):
+    
+    '''Util class to represent an integer polynomial of some input symbols
+    (e.g. the noun and the verb of a program). It is stored as a dict that
+    associates the exponents of the symbols in each monomial to its
+    coefficient. Operations that only involve constants directly give back
+    Python integers.'''
+    
+    def __init__(self, terms, n_symbols):
+        '''Initialization function for a new SymbolicValue.
+        
+        :param terms: Coefficients of the polynomial, for each tuple of symbol
+            exponents.
+        :type terms: dict(tuple(int), int)
+        :param n_symbols: Number of symbols in the polynomial.
+        :type n_symbols: int
+        '''
+        self.terms = terms
+        self.n_symbols = n_symbols
+        
+    @staticmethod
+    def make(terms, n_symbols):
+        '''Creates a new polynomial, or an integer if it is a constant.
+        
+        :param terms: Coefficients of the polynomial, for each tuple of symbol
+            exponents.
+        :type terms: dict(tuple(int), int)
+        :param n_symbols: Number of symbols in the polynomial.
+        :type n_symbols: int
+        :return: Polynomial or constant value.
+        :rtype: SymbolicValue or int
+        '''
+        terms = { e: c for e, c in terms.items() if c != 0 }
+        constant = (0,) * n_symbols
+        if len(terms) == 0 or list(terms) == [ constant ]:
+            return terms.get(constant, 0)
+        return SymbolicValue(terms, n_symbols)
+        
+    @staticmethod
+    def symbols(n_symbols):
+        '''Creates the given number of independent symbols.
+        
+        :param n_symbols: Number of symbols to create.
+        :type n_symbols: int
+        :return: Symbols.
+        :rtype: list(SymbolicValue)
+        '''
+        return [
+            SymbolicValue({ tuple(int(i == j) for j in range(n_symbols)): 1 },
+                n_symbols)
+            for i in range(n_symbols)
+        ]
+        
+    def _get_terms(self, other):
+        if isinstance(other, UnknownValue):
+            return None
+        if isinstance(other, SymbolicValue):
+            return other.terms
+        return { (0,) * self.n_symbols: other }
+        
+    def __add__(self, other):
+        other_terms = self._get_terms(other)
+        if other_terms is None:
+            return other
+        terms = dict(self.terms)
+        for e, c in other_terms.items():
+            terms[e] = terms.get(e, 0) + c
+        return SymbolicValue.make(terms, self.n_symbols)
+        
+    __radd__ = __add__
+    
+    def __mul__(self, other):
+        other_terms = self._get_terms(other)
+        if other_terms is None:
+            return other
+        terms = {}
+        for e1, c1 in self.terms.items():
+            for e2, c2 in other_terms.items():
+                e = tuple(a + b for a, b in zip(e1, e2))
+                terms[e] = terms.get(e, 0) + c1 * c2
+        return SymbolicValue.make(terms, self.n_symbols)
+        
+    __rmul__ = __mul__
+    
+    def _undecidable(self, *args):
+        raise SymbolicExecutionError('The value of {} is needed'.format(self))
+        
+    # any operation that needs the actual value of the polynomial is undecidable
+    __bool__ = __eq__ = __ne__ = __lt__ = __le__ = __gt__ = __ge__ = \
+        __int__ = __index__ = __hash__ = _undecidable
+        
+    def __str__(self):
+        return ' + '.join(
+            '{}*{}'.format(c, '*'.join('x{}^{}'.format(i, p)
+                for i, p in enumerate(e) if p > 0) or '1')
+            for e, c in sorted(self.terms.items())
+        )
+        
+    def degree(self):
+        '''Gets the total degree of the polynomial.
+        
+        :return: Degree of the polynomial.
+        :rtype: int
+        '''
+        return max(sum(e) for e in self.terms)
+        
+    def evaluate(self, values):
+        '''Evaluates the polynomial for the given symbol values.
+        
+        :param values: Values of the symbols.
+        :type values: list(int)
+        :return: Value of the polynomial.
+        :rtype: int
+        '''
+        total = 0
+        for e, c in self.terms.items():
+            for v, p in zip(values, e):
+                c *= v ** p
+            total += c
+        return total
+        
+    def substitute(self, index, value):
+        '''Replaces one of the symbols by a value.
+        
+        :param index: Index of the symbol to replace.
+        :type index: int
+        :param value: Value of the symbol.
+        :type value: int
+        :return: Partially evaluated polynomial.
+        :rtype: SymbolicValue or int
+        '''
+        terms = {}
+        for e, c in self.terms.items():
+            e2 = e[:index] + (0,) + e[index+1:]
+            terms[e2] = terms.get(e2, 0) + c * value ** e[index]
+        return SymbolicValue.make(terms, self.n_symbols)
+
+class UnknownValue(SymbolicValue):
+    
+    '''Util class to represent a value that was read at a symbolic address: it
+    cannot be expressed as a polynomial of the symbols, but it is harmless as
+    long as it is overwritten before being used in a decision.'''
+    
+    def __init__(self, n_symbols):
+        super().__init__(None, n_symbols)
+        
+    def __add__(self, other):
+        return self
+        
+    __radd__ = __mul__ = __rmul__ = __add__
+    
+    def __str__(self):
+        return '?'
+
+class SymbolicIntcodeProgram(IntcodeProgram):
+    
+    '''Util class to run an Intcode program with symbolic values in its code:
+    additions and multiplications build polynomials of the symbols, reads at
+    symbolic addresses give unknown values, while any operation that depends on
+    the actual value of a symbol (or of an unknown value) raises a
+    SymbolicExecutionError.'''
+    
+    def program_get_data(self, index):
+        if isinstance(index, SymbolicValue):
+            return UnknownValue(index.n_symbols)
+        return super().program_get_data(index)
+        
+    def program_set_data(self, index, data):
+        if isinstance(index, SymbolicValue):
+            raise SymbolicExecutionError('Write at symbolic address {}'.format(index))
+        super().program_set_data(index, data)
+        
+    def process_opcode(self):
+        if isinstance(self.instruction_ptr, SymbolicValue) or \
+            isinstance(self.program_get_data(self.instruction_ptr), SymbolicValue):
+            raise SymbolicExecutionError('Symbolic instruction at {}'.format(
+                self.instruction_ptr))
+        return super().process_opcode()